@@ -3,65 +3,27 @@ import json
 
 def dxf_to_json(dxf_file, json_file):
     faces = []
-    current_face = None
-
-    with open(dxf_file, 'r') as file:
-        lines = file.readlines()
-
-    iterator = iter(lines)
     entities_section = False
+    face = None
 
-    for line in iterator:
-        line = line.strip()
-
-        if line == 'SECTION':
-            next_line = next(iterator).strip()
-            if next_line == '2':
-                section_type = next(iterator).strip()
-                if section_type == 'ENTITIES':
-                    entities_section = True
-                else:
+    with open(dxf_file, 'r') as file:
+        # a DXF is a stream of (group code, value) line pairs, read one pair at a time;
+        # this export has stray blank lines, they are skipped
+        lines = (line.strip() for line in file if line.strip())
+        for code, value in zip(lines, lines):
+            code = int(code)
+            if code == 0:
+                if face is not None:
+                    faces.append([tuple(point) for point in face.values()])
+                    face = None
+                if value == 'ENDSEC':
                     entities_section = False
-
-        if entities_section:
-            if line == '0' and next(iterator).strip() == '3DFACE':
-                next(iterator)
-                next(iterator)
-                if current_face is not None:
-                    faces.append(current_face)
-                current_face = []
-            if line == '10':
-                x = float(next(iterator).strip())
-                next(iterator)
-                y = float(next(iterator).strip())
-                next(iterator)
-                z = float(next(iterator).strip())
-                current_face.append((x, y, z))
-                # Repeat for the next points
-            elif line == '11':
-                x = float(next(iterator).strip())
-                next(iterator)
-                y = float(next(iterator).strip())
-                next(iterator)
-                z = float(next(iterator).strip())
-                current_face.append((x, y, z))
-            elif line == '12':
-                x = float(next(iterator).strip())
-                next(iterator)
-                y = float(next(iterator).strip())
-                next(iterator)
-                z = float(next(iterator).strip())
-                current_face.append((x, y, z))
-            elif line == '13':
-                x = float(next(iterator).strip())
-                next(iterator)
-                y = float(next(iterator).strip())
-                next(iterator)
-                z = float(next(iterator).strip())
-                current_face.append((x, y, z))
-
-    if current_face is not None:
-        faces.append(current_face)
+                elif entities_section and value == '3DFACE':
+                    face = {}
+            elif code == 2 and value == 'ENTITIES':
+                entities_section = True
+            elif face is not None and 10 <= code <= 33 and code % 10 <= 3:
+                face.setdefault(code % 10, [0.0, 0.0, 0.0])[code // 10 - 1] = float(value)
 
     json_content = {'faces': [{'points': face} for face in faces]}
 
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+from introduce.lesson02.dxf_reader import Tag
+from introduce.lesson02.entity_store import EntityStore
+from introduce.lesson02.geometry import Affine
+
+# records framing a block definition in the BLOCKS section
+BLOCK_RECORDS = {"BLOCK", "ENDBLK"}
+
+
+@dataclass
+class Insert:
+    """An INSERT, a placed reference to a block, optionally repeated over a grid of rows and columns."""
+    name: str
+    layer: str = "0"
+    insertion: tuple[float, float, float] = (0.0, 0.0, 0.0)
+    scale: tuple[float, float, float] = (1.0, 1.0, 1.0)
+    # degrees, counterclockwise about the extrusion direction
+    rotation: float = 0.0
+    extrusion: tuple[float, float, float] = (0.0, 0.0, 1.0)
+    columns: int = 1
+    rows: int = 1
+    column_spacing: float = 0.0
+    row_spacing: float = 0.0
+    handle: str | None = None
+
+    def transforms(self, base: Sequence[float]) -> list[Affine]:
+        """Block to world transform of every copy, `base` is the base point of the block."""
+        placement = (
+            Affine.ocs(self.extrusion)
+            @ Affine.translation(*self.insertion)
+            @ Affine.rotation_z(math.radians(self.rotation))
+        )
+        scaling = Affine.scaling(*self.scale) @ Affine.translation(-base[0], -base[1], -base[2])
+        return [
+            placement @ Affine.translation(column * self.column_spacing, row * self.row_spacing, 0.0) @ scaling
+            for row in range(max(self.rows, 1))
+            for column in range(max(self.columns, 1))
+        ]
+
+
+def decode_insert(tags: list[Tag]) -> Insert:
+    insert = Insert(name="")
+    insertion = [0.0, 0.0, 0.0]
+    scale = [1.0, 1.0, 1.0]
+    extrusion = [0.0, 0.0, 1.0]
+    for code, value in tags:
+        if code == 2:
+            insert.name = value.decode()
+        elif code == 8:
+            insert.layer = value.decode()
+        elif code == 5:
+            insert.handle = value.decode()
+        elif code in (10, 20, 30):
+            insertion[code // 10 - 1] = float(value)
+        elif code in (41, 42, 43):
+            scale[code - 41] = float(value)
+        elif code == 50:
+            insert.rotation = float(value)
+        elif code == 70:
+            insert.columns = int(value)
+        elif code == 71:
+            insert.rows = int(value)
+        elif code == 44:
+            insert.column_spacing = float(value)
+        elif code == 45:
+            insert.row_spacing = float(value)
+        elif code in (210, 220, 230):
+            extrusion[code // 10 - 21] = float(value)
+    insert.insertion, insert.scale, insert.extrusion = tuple(insertion), tuple(scale), tuple(extrusion)
+    return insert
+
+
+@dataclass
+class Block:
+    name: str
+    base: tuple[float, float, float] = (0.0, 0.0, 0.0)
+    store: EntityStore = field(default_factory=EntityStore)
+    inserts: list[Insert] = field(default_factory=list)
+
+
+class BlockTable:
+    """Block definitions of a drawing.
+
+    A block is parsed once into column arrays, its nested inserts are expanded the first time
+    it is used. Every later insert only transforms those arrays.
+    """
+
+    def __init__(self, blocks: dict[str, Block]):
+        self.blocks = blocks
+        self._geometry: dict[str, EntityStore | None] = {}
+
+    @classmethod
+    def read(cls, records: Iterable[tuple[str, list[Tag]]]) -> BlockTable:
+        """Reads the records of the BLOCKS section, BLOCK and ENDBLK records included."""
+        blocks = {}
+        block = None
+        for entity_type, tags in records:
+            if entity_type == "BLOCK":
+                values = dict(tags)
+                block = Block(
+                    name=values.get(2, b"").decode(),
+                    base=tuple(float(values.get(code, 0.0)) for code in (10, 20, 30)),
+                )
+                blocks[block.name] = block
+            elif entity_type == "ENDBLK":
+                block = None
+            elif block is None:
+                continue
+            elif entity_type == "INSERT":
+                block.inserts.append(decode_insert(tags))
+            else:
+                block.store.add_record(entity_type, tags)
+        return cls(blocks)
+
+    def geometry(self, name: str) -> EntityStore | None:
+        """Content of a block with its nested inserts expanded, in block coordinates."""
+        if name in self._geometry:
+            return self._geometry[name]
+        block = self.blocks.get(name)
+        if block is None:
+            return None
+        # a block inserting itself expands to nothing at the repeated level
+        self._geometry[name] = None
+        store = EntityStore()
+        store.add_store(block.store)
+        self.expand(store, block.inserts)
+        self._geometry[name] = store
+        return store
+
+    def expand(self, store: EntityStore, inserts: Iterable[Insert]) -> None:
+        """Adds the geometry of every insert to `store`."""
+        for insert in inserts:
+            geometry = self.geometry(insert.name)
+            if geometry is None or not geometry.vertex_count:
+                continue
+            for transform in insert.transforms(self.blocks[insert.name].base):
+                store.add_store(geometry, transform, insert.layer)
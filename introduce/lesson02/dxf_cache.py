@@ -0,0 +1,72 @@
+import hashlib
+import os
+import pickle
+
+from introduce.lesson02.blocks import Insert
+from introduce.lesson02.entity_store import EntityStore
+
+# bump when parsing changes what ends up in an EntityStore or a cache entry
+PARSER_VERSION = 5
+
+
+class DXFCache:
+    """On-disk cache of parsed entity tables keyed by file content and parser version.
+
+    An entry is the store of a drawing and its INSERTs, the store already holds their block
+    content. Entries are evicted least recently used first once the directory grows over `max_bytes`.
+    """
+    SUFFIX = ".store"
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path: str, include: set[str]) -> str:
+        digest = hashlib.sha256(f"{PARSER_VERSION}:{','.join(sorted(include))}:".encode())
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def load(self, key: str) -> tuple[EntityStore, list[Insert]] | None:
+        """Returns the entry or None, an entry that can't be loaded is deleted."""
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                store, inserts = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated, corrupt or written by other code, unpickling can raise nearly anything
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            return None
+        os.utime(entry_path)
+        return store, inserts
+
+    def save(self, key: str, store: EntityStore, inserts: list[Insert]) -> None:
+        entry_path = self.entry_path(key)
+        temporary_path = entry_path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump((store, inserts), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, entry_path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
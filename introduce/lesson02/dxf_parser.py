@@ -1,6 +1,19 @@
+import gc
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
 
-from introduce.lesson02.entities import E3DFace, Point, Line, DXFEntity, Layer, EntityType
+from introduce.lesson02.blocks import BLOCK_RECORDS, BlockTable, Insert, decode_insert
+from introduce.lesson02.dxf_cache import DXFCache
+from introduce.lesson02.dxf_reader import DXFReader, MappedDXFReader, Tag, SEQUENCE_RECORDS, join_sequences, \
+    decode_points, open_reader, point_count
+from introduce.lesson02.entity_store import EntityStore
+from introduce.lesson02.entities import E3DFace, Point, Line, DXFEntity, EntityType, LAYERS, Layer, Polyline
+from introduce.lesson02.instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from introduce.lesson02.polylines import decode_lwpolyline, decode_polyline
 
 
 @dataclass
@@ -11,146 +24,322 @@ class Entities:
 
 
 class DXFEntityParser:
-    POINT_MAP = {
-        "8": "layer",
-        "10": "x",
-        "20": "y",
-        "30": "z",
-
-        "11": "x",
-        "21": "y",
-        "31": "z",
-
-        "12": "x",
-        "22": "y",
-        "32": "z",
-
-        "13": "x",
-        "23": "y",
-        "33": "z",
-    }
+    """Builds an entity from the tags of its record, coordinates are decoded by `decode_points`."""
 
-    def parse(self, index_line: int, dxf_lines: list[str]) -> DXFEntity:
+    def parse(self, tags: list[Tag]) -> DXFEntity:
         raise NotImplementedError
 
 
-class PointParser(DXFEntityParser):
+@contextmanager
+def paused_gc():
+    """Entities hold no reference cycles, collecting while they are created in bulk only costs time."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def decode_handle(value: bytes | None) -> str | None:
+    return value.decode() if value is not None else None
+
 
-    def parse(self, index_line: int, dxf_lines: list[str]) -> Point:
-        coordinates = {}
-        for number in range(index_line + 1, len(dxf_lines)):
-            dxf_line = dxf_lines[number].strip()
-            next_line = dxf_lines[number + 1].strip()
+class PointParser(DXFEntityParser):
 
-            coordinate = self.POINT_MAP.get(dxf_line, None)
-            if coordinate == "layer":
-                coordinates[coordinate] = Layer(name=next_line, type=EntityType.POINT)
-                continue
-            if coordinate:
-                coordinates[coordinate] = float(next_line)
-            if len(coordinates) == 4:
-                break
-        return Point(**coordinates)
+    def parse(self, tags: list[Tag]) -> Point:
+        values = dict(tags)
+        layer = LAYERS.get(values.get(8, b"0").decode(), EntityType.POINT)
+        handle = values.get(5)
+        x, y, z = decode_points(values, 1)
+        return Point(x, y, z, layer=layer, handle=decode_handle(handle))
 
 
 class LineParser(DXFEntityParser):
 
-    def parse(self, index_line: int, dxf_lines: list[str]) -> Line:
-        start_coordinates = {}
-        end_coordinates = {}
-        layer = Layer(name="0", type=EntityType.LINE)
-        for i in range(index_line + 1, len(dxf_lines)):
-            dxf_line = dxf_lines[i].strip()
-            next_line = dxf_lines[i + 1].strip()
-
-            if dxf_line in ("10", "20", "30"):
-                coordinate = self.POINT_MAP.get(dxf_line, None)
-                if coordinate:
-                    start_coordinates[coordinate] = float(next_line)
-            elif dxf_line in ("11", "21", "31"):
-                coordinate = self.POINT_MAP.get(dxf_line, None)
-                if coordinate:
-                    end_coordinates[coordinate] = float(next_line)
-            elif dxf_line == "8":
-                layer = Layer(name=next_line, type=EntityType.LINE)
-            if len(start_coordinates) + len(end_coordinates) == 6:
-                break
+    def parse(self, tags: list[Tag]) -> Line:
+        values = dict(tags)
+        layer = LAYERS.get(values.get(8, b"0").decode(), EntityType.LINE)
+        handle = values.get(5)
+        x1, y1, z1, x2, y2, z2 = decode_points(values, 2)
         return Line(
-            start=Point(layer=layer, **start_coordinates),
-            end=Point(layer=layer, **end_coordinates),
+            start=Point(x1, y1, z1, layer=layer),
+            end=Point(x2, y2, z2, layer=layer),
             layer=layer,
+            handle=decode_handle(handle),
         )
 
 
 class E3DFaceParser(DXFEntityParser):
     E3DFACE_POINT_COUNT = 4
 
-    def parse(self, index_line: int, dxf_lines: list[str]) -> E3DFace:
-        points = {}
-        layer = Layer(name="0", type=EntityType.E3DFACE)
-        for i in range(index_line + 1, len(dxf_lines)):
-            dxf_line = dxf_lines[i].strip()
-            next_line = dxf_lines[i + 1].strip()
-            coordinate = self.POINT_MAP.get(dxf_line, None)
-            if coordinate == "layer":
-                layer = Layer(name=next_line, type=EntityType.E3DFACE)
-                continue
-            if coordinate:
-                points.setdefault(f"{dxf_line[1]}", {})[coordinate] = float(next_line)
-                points.setdefault(f"{dxf_line[1]}", {})["layer"] = layer
-            if len(points) == self.E3DFACE_POINT_COUNT and all([len(c) == 4 for c in points.values()]):
-                break
-
-        return E3DFace(points=[Point(**coordinates) for coordinates in points.values()], layer=layer)
+    def parse(self, tags: list[Tag]) -> E3DFace:
+        values = dict(tags)
+        layer = LAYERS.get(values.get(8, b"0").decode(), EntityType.E3DFACE)
+        handle = values.get(5)
+        coordinates = decode_points(values, point_count(values, self.E3DFACE_POINT_COUNT))
+        return E3DFace(
+            points=[Point(*coordinates[i:i + 3], layer=layer) for i in range(0, len(coordinates), 3)],
+            layer=layer,
+            handle=decode_handle(handle),
+        )
+
+
+class LWPolylineParser(DXFEntityParser):
+
+    def parse(self, tags: list[Tag]) -> Polyline:
+        layer, handle, closed, coordinates = decode_lwpolyline(tags)
+        return Polyline(array("d", coordinates), LAYERS.get(layer, EntityType.LINE), closed, handle)
+
+
+class PolylineParser(DXFEntityParser):
+
+    def parse(self, tags: list[Tag]) -> Polyline | None:
+        decoded = decode_polyline(tags)
+        if decoded is None:
+            return None
+        layer, handle, closed, coordinates = decoded
+        return Polyline(array("d", coordinates), LAYERS.get(layer, EntityType.LINE), closed, handle)
+
+
+class InsertParser(DXFEntityParser):
+
+    def parse(self, tags: list[Tag]) -> Insert:
+        return decode_insert(tags)
 
 
 class DXFParser:
-    dxf_lines: list[str] = []
-    entities: dict[str, list[DXFEntity | Point | Line | E3DFace]] = {
-        "POINT": [],
-        "LINE": [],
-        "3DFACE": []
-    }
+    # keys of the dict returned by `parse`, INSERTs are expanded into the other lists
+    ENTITY_TYPES = ("POINT", "LINE", "3DFACE", "POLYLINE")
 
-    INCLUDED_ENTITIES = ["POINT", "LINE", "3DFACE"]
+    INCLUDED_ENTITIES = ["POINT", "LINE", "3DFACE", "LWPOLYLINE", "POLYLINE", "INSERT"]
 
     PARSER_MAP: dict[str, DXFEntityParser] = {
         "POINT": PointParser(),
         "LINE": LineParser(),
-        "3DFACE": E3DFaceParser()
+        "3DFACE": E3DFaceParser(),
+        "LWPOLYLINE": LWPolylineParser(),
+        "POLYLINE": PolylineParser(),
+        "INSERT": InsertParser(),
     }
 
-    def __init__(self, path: str):
-        with open(path, "r") as f:
-            self.dxf_lines = f.readlines()
-            f.close()
+    # both kinds of polylines end up in the same list
+    ENTITY_GROUPS = {"LWPOLYLINE": "POLYLINE"}
+
+    def __init__(
+            self,
+            path: str,
+            include: set[str] | None = None,
+            reader_class: type[DXFReader] = MappedDXFReader,
+            workers: int = 1,
+            cache: DXFCache | None = None,
+            instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+    ):
+        self.path = path
+        self.reader_class = reader_class
+        self.include = set(self.INCLUDED_ENTITIES) if include is None else set(include) & set(self.PARSER_MAP)
+        self.workers = workers
+        self.cache = cache
+        self.instrumentation = instrumentation
+        self.entities: dict[str, list[DXFEntity | Point | Line | E3DFace | Polyline]] = self.empty_entities()
+
+    @classmethod
+    def empty_entities(cls) -> dict[str, list[DXFEntity]]:
+        return {entity_type: [] for entity_type in cls.ENTITY_TYPES}
 
     def parse(self) -> dict[str, list[DXFEntity | Point | Line | E3DFace]]:
-
-        in_entities_section = False
-        for i, line in enumerate(self.dxf_lines):
-            line = line.strip()
-            if line == "ENTITIES":
-                in_entities_section = True
-                continue
-
-            if in_entities_section:
-                if line == "ENDSEC":
-                    break
-
-            parser = self.PARSER_MAP.get(line)
-            if parser is None:
-                continue
-            entity = parser.parse(i, self.dxf_lines)
-            self.entities[line].append(entity)
+        """Parses the whole drawing into `entities`, a parse again starts from empty lists."""
+        self.entities = self.empty_entities()
+        with self.instrumentation.stage("parse"):
+            entities = self._parse()
+            for entity_type, items in entities.items():
+                self.instrumentation.count(f"entities.{entity_type}", len(items))
+        return entities
+
+    def _parse(self) -> dict[str, list[DXFEntity | Point | Line | E3DFace]]:
+        if self.cache is not None:
+            return self._merge([self._parse_store()[0].to_entities()])
+        with self.instrumentation.stage("entities"):
+            with open(self.path, "rb") as f, open_reader(f, self.reader_class) as reader:
+                section = reader.sections().get("ENTITIES")
+                if section is None:
+                    return self.entities
+                # more processes than CPUs only add pickling and start-up time
+                workers = min(self.workers, usable_cpus())
+                ranges = reader.split_records(*section, parts=workers) if workers > 1 else [section]
+                if len(ranges) == 1:
+                    entities, inserts = self.parse_records(read_records(reader, *section, self.include))
+                    parsed = [entities]
+
+            if len(ranges) > 1:
+                # entities are independent records, every worker parses its own byte range of ENTITIES
+                # into column arrays, which pickle in one piece instead of object by object
+                with ProcessPoolExecutor(len(ranges)) as executor:
+                    parts = list(executor.map(
+                        _parse_range,
+                        *zip(*[(self.path, self.include, self.reader_class, start, end) for start, end in ranges])
+                    ))
+                store = EntityStore()
+                inserts = []
+                for part, part_inserts in parts:
+                    store.add_store(part)
+                    inserts.extend(part_inserts)
+                parsed = [store.to_entities()]
+        if inserts:
+            with self.instrumentation.stage("blocks"), open(self.path, "rb") as f:
+                with open_reader(f, self.reader_class) as reader:
+                    store = EntityStore()
+                    self.read_blocks(reader).expand(store, inserts)
+            parsed.append(store.to_entities())
+        return self._merge(parsed)
+
+    def iter_entities(
+            self, types: Iterable[str] | None = None, layer: Callable[[Layer], bool] | None = None
+    ) -> Iterator[tuple[str, DXFEntity]]:
+        """Yields (type, entity) one at a time in drawing order, types are the keys of `parse`.
+
+        Nothing is kept once yielded, an INSERT is expanded when it is reached and yields the
+        entities of its block instead of itself. `types` limits the entity types, `layer`
+        keeps only the entities whose layer it accepts, e.g. `Layer.is_valid`.
+        """
+        include = self.include
+        if types is not None:
+            types = set(types)
+            groups = {entity_type for entity_type in include if self.ENTITY_GROUPS.get(entity_type) in types}
+            include = include & (types | groups | {"INSERT"})
+        blocks = None
+        with open(self.path, "rb") as f, open_reader(f, self.reader_class) as reader:
+            section = reader.sections().get("ENTITIES")
+            for entity_type, tags in read_records(reader, *section, include) if section else ():
+                entity = self.PARSER_MAP[entity_type].parse(tags)
+                if entity is None:
+                    continue
+                if entity_type == "INSERT":
+                    if blocks is None:
+                        # a stream reader seeks, reading BLOCKS through `reader` would move it off ENTITIES
+                        with open(self.path, "rb") as blocks_file:
+                            with open_reader(blocks_file, self.reader_class) as blocks_reader:
+                                blocks = self.read_blocks(blocks_reader)
+                    store = EntityStore()
+                    blocks.expand(store, [entity])
+                    expanded = ((t, e) for t, items in store.to_entities().items() for e in items)
+                else:
+                    expanded = [(self.ENTITY_GROUPS.get(entity_type, entity_type), entity)]
+                for group, item in expanded:
+                    if (types is None or group in types) and (layer is None or layer(item.layer)):
+                        yield group, item
+
+    def parse_to_store(self) -> EntityStore:
+        """Parses ENTITIES into column arrays without building an object per entity.
+
+        With a cache a store parsed earlier from the same content is loaded instead.
+        """
+        return self._parse_store()[0]
+
+    def _parse_store(self) -> tuple[EntityStore, list[Insert]]:
+        """The store with INSERTs expanded and the INSERTs themselves, cached together."""
+        key = None
+        if self.cache is not None:
+            with self.instrumentation.stage("cache_load"):
+                key = self.cache.key(self.path, self.include)
+                entry = self.cache.load(key)
+            self.instrumentation.count("cache_hits", entry is not None)
+            if entry is not None:
+                return entry
+        with open(self.path, "rb") as f, open_reader(f, self.reader_class) as reader:
+            with self.instrumentation.stage("entities"), paused_gc():
+                section = reader.sections().get("ENTITIES")
+                store, inserts = store_records(read_records(reader, *section, self.include) if section else ())
+            if inserts:
+                with self.instrumentation.stage("blocks"):
+                    self.read_blocks(reader).expand(store, inserts)
+        if key is not None:
+            with self.instrumentation.stage("cache_save"):
+                self.cache.save(key, store, inserts)
+        return store, inserts
+
+    def read_blocks(self, reader: DXFReader) -> BlockTable:
+        section = reader.sections().get("BLOCKS")
+        if section is None:
+            return BlockTable({})
+        return BlockTable.read(read_records(reader, *section, self.include | BLOCK_RECORDS))
+
+    def _merge(self, parsed: Iterable[dict[str, list[DXFEntity]]]) -> dict[str, list[DXFEntity]]:
+        for entities in parsed:
+            for entity_type, items in entities.items():
+                self.entities[entity_type].extend(items)
         return self.entities
 
+    @classmethod
+    def parse_records(
+            cls, records: Iterable[tuple[str, list[Tag]]]
+    ) -> tuple[dict[str, list[DXFEntity]], list[Insert]]:
+        """Parses the records into entity lists, INSERTs are returned for expansion instead."""
+        entities = cls.empty_entities()
+        inserts = []
+        with paused_gc():
+            for entity_type, tags in records:
+                entity = cls.PARSER_MAP[entity_type].parse(tags)
+                if entity is None:
+                    continue
+                if entity_type == "INSERT":
+                    inserts.append(entity)
+                else:
+                    entities[cls.ENTITY_GROUPS.get(entity_type, entity_type)].append(entity)
+        return entities, inserts
+
+
+def read_records(reader: DXFReader, start: int, end: int, include: set[str]) -> Iterable[tuple[str, list[Tag]]]:
+    """Records of a byte range, a POLYLINE comes with its VERTEX records joined to it."""
+    if "POLYLINE" not in include:
+        return reader.iter_records(start, end, include=include)
+    return join_sequences(reader.iter_records(start, end, include=include | SEQUENCE_RECORDS))
+
+
+def usable_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def store_records(records: Iterable[tuple[str, list[Tag]]]) -> tuple[EntityStore, list[Insert]]:
+    """Adds the records to a new store, INSERTs are decoded and returned for expansion instead."""
+    store = EntityStore()
+    inserts = []
+    for entity_type, tags in records:
+        if entity_type == "INSERT":
+            inserts.append(decode_insert(tags))
+        else:
+            store.add_record(entity_type, tags)
+    return store, inserts
+
+
+def _parse_range(
+        path: str, include: set[str], reader_class: type[DXFReader], start: int, end: int
+) -> tuple[EntityStore, list[Insert]]:
+    with open(path, "rb") as f, open_reader(f, reader_class) as reader, paused_gc():
+        return store_records(read_records(reader, start, end, include))
+
 
 if __name__ == '__main__':
-    parser = DXFParser("data/test.dxf")
-    entities = parser.parse()
-    for k, v in entities.items():
-        print(f"Entities of type {k}:")
-        for entity in v:
-            print("    ", entity.to_tuple())
+    # python -m introduce.lesson02.dxf_parser [drawing.dxf ...] prints the entities of the drawings and
+    # checks that `iter_entities` yields as many entities of every type as `parse`, with every reader
+    import sys
+    from collections import Counter
+
+    failed = 0
+    for path in sys.argv[1:] or ["data/test.dxf"]:
+        entities = DXFParser(path).parse()
+        for k, v in entities.items():
+            print(f"Entities of type {k}:")
+            for entity in v:
+                print("    ", entity.to_tuple())
+        for reader_class in (DXFReader, MappedDXFReader):
+            parser = DXFParser(path, reader_class=reader_class)
+            parsed = Counter({k: len(v) for k, v in parser.parse().items()})
+            streamed = Counter(entity_type for entity_type, _ in parser.iter_entities())
+            failed += parsed != streamed
+            print(f"{path} {reader_class.__name__}: parse {dict(parsed)}, iter_entities {dict(streamed)}")
+    sys.exit(1 if failed else 0)
 
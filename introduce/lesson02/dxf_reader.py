@@ -0,0 +1,416 @@
+import mmap
+import struct
+import re
+from itertools import repeat
+from typing import BinaryIO, Iterable, Iterator
+
+# (group code, value), `BinaryDXFReader` hands out numeric values as int and float
+Tag = tuple[int, bytes]
+
+SECTION = b"SECTION"
+ENDSEC = b"ENDSEC"
+
+# records continuing the POLYLINE before them
+SEQUENCE_RECORDS = {"VERTEX", "SEQEND"}
+
+# x, y and z group codes of the up to four points of a record: 10, 20, 30, 11, 21, 31, ...
+POINT_CODES = tuple(axis * 10 + point for point in range(4) for axis in (1, 2, 3))
+
+
+def decode_points(values: dict[int, bytes], count: int) -> list[float]:
+    """x, y, z of the first `count` points of a record, `values` is `dict(tags)`.
+
+    All coordinates go through a single `map(float, ...)` instead of a branch per tag, a
+    missing coordinate is 0.0.
+    """
+    return list(map(float, map(values.get, POINT_CODES[:count * 3], repeat(b"0"))))
+
+
+def point_count(values: dict[int, bytes], limit: int = 4) -> int:
+    """Number of points of a record, up to the last point with an x."""
+    count = 1
+    for point in range(1, limit):
+        if 10 + point in values:
+            count = point + 1
+    return count
+
+
+# a group code 0 line followed by a value that is not a number, i.e. the type of a record
+RECORD_PATTERN = re.compile(rb"^[ \t]*0\r?\n(?![ \t]*-?\d+\r?$)([^\r\n]+)\r?\n", re.MULTILINE)
+# a group code line and its value line, the last one may miss its line break
+TAG_PATTERN = re.compile(rb"[ \t]*(-?\d+)[ \t]*\r?\n([^\r\n]*)(?:\r?\n|\Z)")
+SECTION_PATTERN = re.compile(
+    rb"^[ \t]*0\r?\n(?:SECTION\r?\n[ \t]*2\r?\n([^\r\n]*)|ENDSEC)\r?\n", re.MULTILINE
+)
+
+
+def iter_tags(stream: BinaryIO, end: int | None = None) -> Iterator[Tag]:
+    """Yields (group_code, value) pairs reading the stream exactly once."""
+    readline = stream.readline
+    position = stream.tell()
+    while end is None or position < end:
+        code = readline()
+        if not code:
+            return
+        value = readline()
+        position += len(code) + len(value)
+        yield int(code), value.strip()
+
+
+def iter_records(tags: Iterable[Tag], include: set[str] | None = None) -> Iterator[tuple[str, list[Tag]]]:
+    """Groups tags into records, every record starts with group code 0.
+
+    Tags of records whose type is not in `include` are dropped without being collected.
+    """
+    entity_type = None
+    record: list[Tag] | None = None
+    for code, value in tags:
+        if code == 0:
+            if record is not None:
+                yield entity_type, record
+            entity_type = value.decode()
+            record = [] if include is None or entity_type in include else None
+            continue
+        if record is not None:
+            record.append((code, value))
+    if record is not None:
+        yield entity_type, record
+
+
+def join_sequences(records: Iterable[tuple[str, list[Tag]]]) -> Iterator[tuple[str, list[Tag]]]:
+    """Appends the VERTEX records following a POLYLINE to its tags, each one opened by (0, b"VERTEX").
+
+    SEQEND records and vertices outside of a polyline are dropped.
+    """
+    polyline: list[Tag] | None = None
+    for entity_type, tags in records:
+        if entity_type == "VERTEX":
+            if polyline is not None:
+                polyline.append((0, b"VERTEX"))
+                polyline.extend(tags)
+            continue
+        if polyline is not None:
+            yield "POLYLINE", polyline
+            polyline = None
+        if entity_type == "POLYLINE":
+            polyline = tags
+        elif entity_type != "SEQEND":
+            yield entity_type, tags
+    if polyline is not None:
+        yield "POLYLINE", polyline
+
+
+class DXFReader:
+    """Reads a text DXF stream, sections are addressed by byte offsets."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self._sections: dict[str, tuple[int, int]] | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def sections(self) -> dict[str, tuple[int, int]]:
+        """Maps section name to the (start, end) byte range of its content.
+
+        `start` points right after the section name tag, `end` at the ENDSEC tag.
+        """
+        if self._sections is not None:
+            return self._sections
+        self._sections = {}
+        self.stream.seek(0)
+        readline = self.stream.readline
+        position = 0
+        name = None
+        start = 0
+        while True:
+            code = readline()
+            if not code:
+                break
+            value = readline()
+            tag_start = position
+            position += len(code) + len(value)
+            if code.strip() != b"0":
+                continue
+            value = value.strip()
+            if value == SECTION:
+                name_code = readline()
+                name_value = readline()
+                position += len(name_code) + len(name_value)
+                name = name_value.strip().decode()
+                start = position
+            elif value == ENDSEC and name is not None:
+                self._sections[name] = (start, tag_start)
+                name = None
+        return self._sections
+
+    def iter_tags(self, start: int = 0, end: int | None = None) -> Iterator[Tag]:
+        self.stream.seek(start)
+        return iter_tags(self.stream, end)
+
+    def iter_records(
+            self, start: int = 0, end: int | None = None, include: set[str] | None = None
+    ) -> Iterator[tuple[str, list[Tag]]]:
+        return iter_records(self.iter_tags(start, end), include)
+
+    def split_records(self, start: int, end: int, parts: int) -> list[tuple[int, int]]:
+        """Splits a byte range into up to `parts` ranges aligned to record boundaries."""
+        return [(start, end)]
+
+    def iter_section(self, name: str, include: set[str] | None = None) -> Iterator[tuple[str, list[Tag]]]:
+        section = self.sections().get(name)
+        if section is None:
+            return iter(())
+        return self.iter_records(*section, include=include)
+
+
+class MappedDXFReader(DXFReader):
+    """Text DXF reader working on a memory map of the file.
+
+    Records are located with a regex over the mapped buffer, so skipped records are never
+    copied out of it, kept records hand out byte values that `float()` decodes directly.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        super().__init__(stream)
+        stream.seek(0, 2)
+        if stream.tell():
+            self.buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.buffer = b""
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def sections(self) -> dict[str, tuple[int, int]]:
+        if self._sections is not None:
+            return self._sections
+        self._sections = {}
+        name = None
+        start = 0
+        for match in SECTION_PATTERN.finditer(self.buffer):
+            if match.group(1) is not None:
+                name = match.group(1).strip().decode()
+                start = match.end()
+            elif name is not None:
+                self._sections[name] = (start, match.start())
+                name = None
+        return self._sections
+
+    def iter_tags(self, start: int = 0, end: int | None = None) -> Iterator[Tag]:
+        """Matches tag after tag in place, only the code and value of each tag are copied out."""
+        buffer = self.buffer
+        end = len(buffer) if end is None else end
+        match_tag = TAG_PATTERN.match
+        position = start
+        while position < end:
+            match = match_tag(buffer, position, end)
+            if match is None:
+                raise ValueError(f"malformed tag at byte {position}")
+            yield int(match.group(1)), match.group(2).strip()
+            position = match.end()
+
+    def iter_records(
+            self, start: int = 0, end: int | None = None, include: set[str] | None = None
+    ) -> Iterator[tuple[str, list[Tag]]]:
+        buffer = self.buffer
+        end = len(buffer) if end is None else end
+        entity_type = None
+        body_start = 0
+        for match in RECORD_PATTERN.finditer(buffer, start, end):
+            if entity_type is not None:
+                yield entity_type, self._record_tags(body_start, match.start())
+            entity_type = match.group(1).strip().decode()
+            if include is not None and entity_type not in include:
+                entity_type = None
+            body_start = match.end()
+        if entity_type is not None:
+            yield entity_type, self._record_tags(body_start, end)
+
+    def split_records(self, start: int, end: int, parts: int) -> list[tuple[int, int]]:
+        bounds = [start]
+        step = (end - start) // max(parts, 1)
+        for i in range(1, parts):
+            match = RECORD_PATTERN.search(self.buffer, max(start + i * step, bounds[-1] + 1), end)
+            # never split a polyline from its vertices
+            while match is not None and match.group(1).strip().decode() in SEQUENCE_RECORDS:
+                match = RECORD_PATTERN.search(self.buffer, match.end(), end)
+            if match is None:
+                break
+            bounds.append(match.start())
+        bounds.append(end)
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+    def _record_tags(self, start: int, end: int) -> list[Tag]:
+        lines = self.buffer[start:end].splitlines()
+        return [(int(code), value.strip()) for code, value in zip(lines[0::2], lines[1::2])]
+
+
+BINARY_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+
+# value types of binary DXF group codes
+STRING, DOUBLE, INT16, INT32, INT64, BOOL, CHUNK = range(7)
+VALUE_TYPES: list[int | None] = [None] * 1072
+for codes, value_type in (
+        ((0, 10), STRING), ((10, 60), DOUBLE), ((60, 80), INT16), ((90, 100), INT32), ((100, 110), STRING),
+        ((110, 150), DOUBLE), ((160, 170), INT64), ((170, 180), INT16), ((210, 240), DOUBLE),
+        ((270, 290), INT16), ((290, 300), BOOL), ((300, 310), STRING), ((310, 320), CHUNK),
+        ((320, 370), STRING), ((370, 390), INT16), ((390, 400), STRING), ((400, 410), INT16),
+        ((410, 420), STRING), ((420, 430), INT32), ((430, 440), STRING), ((440, 460), INT32),
+        ((460, 470), DOUBLE), ((470, 482), STRING), ((999, 1004), STRING), ((1004, 1005), CHUNK),
+        ((1005, 1010), STRING), ((1010, 1060), DOUBLE), ((1060, 1071), INT16), ((1071, 1072), INT32),
+):
+    VALUE_TYPES[codes[0]:codes[1]] = [value_type] * (codes[1] - codes[0])
+# bytes taken by a value of fixed size, 0 for null terminated strings, -1 for length prefixed chunks
+VALUE_SIZES = {DOUBLE: 8, INT16: 2, INT32: 4, INT64: 8, BOOL: 1, STRING: 0, CHUNK: -1}
+
+DOUBLE_STRUCT = struct.Struct("<d")
+INT16_STRUCT = struct.Struct("<h")
+INT32_STRUCT = struct.Struct("<i")
+INT64_STRUCT = struct.Struct("<q")
+
+
+class BinaryDXFReader(DXFReader):
+    """Binary DXF reader working on a memory map of the file.
+
+    Yields the same tags as the text readers, except that numeric values come as int and float
+    instead of their text, which every consumer passes through `int()`/`float()` anyway.
+    Binary chunks are handed out as upper case hex like in a text DXF. Byte offsets in
+    `sections()` point into the binary file.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        super().__init__(stream)
+        stream.seek(0, 2)
+        if stream.tell():
+            self.buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.buffer = b""
+        if self.buffer[:len(BINARY_SENTINEL)] != BINARY_SENTINEL:
+            raise ValueError("not a binary DXF file")
+        # R12 and older store a group code in one byte with 255 escaping a two byte one,
+        # newer files always use two bytes; the first tag is (0, SECTION) either way
+        self.short_codes = self.buffer[len(BINARY_SENTINEL) + 1:len(BINARY_SENTINEL) + 2] != b"\x00"
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def sections(self) -> dict[str, tuple[int, int]]:
+        """Walks the tags of the whole file, only the strings of group codes 0 and 2 are decoded."""
+        if self._sections is not None:
+            return self._sections
+        self._sections = {}
+        buffer = self.buffer
+        end = len(buffer)
+        short_codes = self.short_codes
+        unpack_int16 = INT16_STRUCT.unpack_from
+        sizes = [VALUE_SIZES.get(value_type) for value_type in VALUE_TYPES]
+        name = None
+        start = 0
+        previous = None
+        position = len(BINARY_SENTINEL)
+        while position < end:
+            tag_start = position
+            if short_codes and buffer[position] != 255:
+                code = buffer[position]
+                position += 1
+            else:
+                code = unpack_int16(buffer, position + short_codes)[0]
+                position += 2 + short_codes
+            size = sizes[code] if 0 <= code < len(sizes) else None
+            if size is None:
+                raise ValueError(f"unknown group code {code} at byte {tag_start}")
+            if size > 0:
+                position += size
+                continue
+            if size < 0:
+                position += 1 + buffer[position]
+                continue
+            stop = buffer.find(b"\x00", position)
+            if stop < 0:
+                raise ValueError(f"unterminated string of group code {code} at byte {position}")
+            if code == 0:
+                value = buffer[position:stop]
+                if value == ENDSEC and name is not None:
+                    self._sections[name] = (start, tag_start)
+                    name = None
+                previous = value
+            elif code == 2 and previous == SECTION:
+                name = buffer[position:stop].decode()
+                start = stop + 1
+                previous = None
+            position = stop + 1
+        return self._sections
+
+    def iter_tags(self, start: int = 0, end: int | None = None) -> Iterator[Tag]:
+        start = max(start, len(BINARY_SENTINEL))
+        end = len(self.buffer) if end is None else end
+        buffer = self.buffer
+        short_codes = self.short_codes
+        value_types = VALUE_TYPES
+        unpack_double = DOUBLE_STRUCT.unpack_from
+        unpack_int16 = INT16_STRUCT.unpack_from
+        position = start
+        while position < end:
+            tag_start = position
+            if short_codes:
+                code = buffer[position]
+                position += 1
+                if code == 255:
+                    code = unpack_int16(buffer, position)[0]
+                    position += 2
+            else:
+                code = unpack_int16(buffer, position)[0]
+                position += 2
+            value_type = value_types[code] if 0 <= code < len(value_types) else None
+            if value_type == DOUBLE:
+                value = unpack_double(buffer, position)[0]
+                position += 8
+            elif value_type == STRING:
+                stop = buffer.find(b"\x00", position)
+                if stop < 0:
+                    raise ValueError(f"unterminated string of group code {code} at byte {position}")
+                value = buffer[position:stop]
+                position = stop + 1
+            elif value_type == INT16:
+                value = unpack_int16(buffer, position)[0]
+                position += 2
+            elif value_type == INT32:
+                value = INT32_STRUCT.unpack_from(buffer, position)[0]
+                position += 4
+            elif value_type == INT64:
+                value = INT64_STRUCT.unpack_from(buffer, position)[0]
+                position += 8
+            elif value_type == BOOL:
+                value = buffer[position]
+                position += 1
+            elif value_type == CHUNK:
+                size = buffer[position]
+                value = buffer[position + 1:position + 1 + size].hex().upper().encode()
+                position += 1 + size
+            else:
+                raise ValueError(f"unknown group code {code} at byte {tag_start}")
+            yield code, value
+
+
+def is_binary_dxf(stream: BinaryIO) -> bool:
+    position = stream.tell()
+    stream.seek(0)
+    head = stream.read(len(BINARY_SENTINEL))
+    stream.seek(position)
+    return head == BINARY_SENTINEL
+
+
+def open_reader(stream: BinaryIO, reader_class: type[DXFReader] = MappedDXFReader) -> DXFReader:
+    """`reader_class` over a text DXF, a `BinaryDXFReader` when the stream starts with the binary sentinel."""
+    if is_binary_dxf(stream):
+        return BinaryDXFReader(stream)
+    return reader_class(stream)
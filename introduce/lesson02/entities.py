@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Iterator
 
 
 class DXFEntity:
@@ -25,6 +28,8 @@ class Layer:
     name: str
     unique_name: str | None = None
     type: EntityType | None = EntityType.POINT
+    valid: bool = field(default=False, init=False, repr=False, compare=False)
+    dof_valid: bool = field(default=False, init=False, repr=False, compare=False)
 
     LINE_LAYER_PATTERN = re.compile("B+\d+\s+H+\d+")
     E3DFACE_LAYER_PATTERN = re.compile("H\s*(\d+)")
@@ -33,9 +38,12 @@ class Layer:
     E3DFACE_NUMBER_PATTERN = re.compile("H\s*(\d+)")
     # POINT_LAYER_PATTERN = re.compile(r"DOF\b(?:\s+x)?(?:\s+y)?(?:\s+z)?(?:\s+fx)?(?:\s+fy)?(?:\s+fz)?\b")
     POINT_LAYER_PATTERN = re.compile(r"DOF\b(?:\s+x)?(?:\s+y)?(?:\s+z)?(?:\s+fx)?(?:\s+fy)?(?:\s+fz)?\s*$")
+    CLEANUP_PATTERN = re.compile(r"DOF|x|y|z|fx|fy|fz")
 
     def __post_init__(self):
-        if not self.is_valid():
+        self.valid = self._check_valid()
+        self.dof_valid = bool(self.POINT_LAYER_PATTERN.findall(self.name))
+        if not self.valid:
             self.unique_name = self.name
             return
         if self.type == EntityType.LINE:
@@ -57,18 +65,19 @@ class Layer:
         return f"Layer({self.name})"
 
     def is_dof_valid(self) -> bool:
-        return bool(self.POINT_LAYER_PATTERN.findall(self.name))
+        return self.dof_valid
 
     def is_valid(self) -> bool:
+        return self.valid
+
+    def _check_valid(self) -> bool:
         if self.type == EntityType.LINE:
             return bool(self.LINE_LAYER_PATTERN.findall(self.name))
         elif self.type == EntityType.E3DFACE:
             return bool(self.E3DFACE_LAYER_PATTERN.findall(self.name))
         elif self.type == EntityType.POINT:
-
-            CLEANUP_PATTERN = re.compile(r"DOF|x|y|z|fx|fy|fz")
             p_name = self.POINT_LAYER_PATTERN.findall(self.name)
-            cleaned_name = CLEANUP_PATTERN.findall(self.name)
+            cleaned_name = self.CLEANUP_PATTERN.findall(self.name)
             cleaned_name = " ".join(cleaned_name)
             if not p_name:
                 return False
@@ -80,6 +89,35 @@ class Layer:
         return hash(self.unique_name)
 
 
+class LayerRegistry:
+    """Interns layers by (name, type), so the patterns run once per distinct layer."""
+
+    def __init__(self):
+        self._layers: dict[tuple[str, int], Layer] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, type: EntityType | int = EntityType.POINT) -> Layer:
+        layer = self._layers.get((name, type))
+        if layer is None:
+            self.misses += 1
+            layer = self._layers[(name, type)] = Layer(name=name, type=type)
+        else:
+            self.hits += 1
+        return layer
+
+    def __len__(self):
+        return len(self._layers)
+
+    def clear(self):
+        self._layers.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+LAYERS = LayerRegistry()
+
+
 @dataclass
 class Point(DXFEntity):
     x: float
@@ -87,6 +125,7 @@ class Point(DXFEntity):
     z: float
     layer: Layer
     accuracy: float = 0.005
+    handle: str | None = None
 
     def __eq__(self, other: Point):
         return (
@@ -117,6 +156,7 @@ class Line(DXFEntity):
     start: Point
     end: Point
     layer: Layer
+    handle: str | None = None
 
     def to_tuple(self):
         return (self.start.to_tuple(), self.end.to_tuple(), self.layer)
@@ -133,9 +173,71 @@ class Line(DXFEntity):
 class E3DFace(DXFEntity):
     points: list[Point]
     layer: Layer
+    handle: str | None = None
 
     def to_tuple(self):
         return tuple([point.to_tuple() for point in self.points])
 
     def is_triangle(self):
         return len(set(self.points)) == 3
+
+
+@dataclass
+class Polyline(DXFEntity):
+    """LWPOLYLINE/POLYLINE as a run of world coordinates (x, y, z per vertex).
+
+    Segments are pairs of vertex indices, neighbouring segments share their vertex.
+    """
+    coordinates: array
+    layer: Layer
+    closed: bool = False
+    handle: str | None = None
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.coordinates) // 3
+
+    def segments(self) -> Iterator[tuple[int, int]]:
+        count = self.vertex_count
+        for i in range(count - 1):
+            yield i, i + 1
+        if self.closed and count > 2:
+            yield count - 1, 0
+
+    @property
+    def points(self) -> list[Point]:
+        values = iter(self.coordinates)
+        return [Point(x, y, z, layer=self.layer) for x, y, z in zip(values, values, values)]
+
+    def without_segments(self, dropped: set[int]) -> list[Polyline]:
+        """Splits the polyline where the given segments, numbered like `segments()`, are left out."""
+        if not dropped:
+            return [self]
+        runs = []
+        run = [0]
+        for number, (start, end) in enumerate(self.segments()):
+            if number in dropped:
+                runs.append(run)
+                run = [end]
+            else:
+                run.append(end)
+        runs.append(run)
+        if self.closed:
+            # the run through the closing segment continues into the first one
+            first = runs.pop(0)
+            runs[-1] = runs[-1] + first[1:]
+        coordinates = self.coordinates
+        return [
+            Polyline(
+                array("d", chain.from_iterable(coordinates[i * 3:i * 3 + 3] for i in run)), self.layer,
+                handle=self.handle,
+            )
+            for run in runs if len(run) > 1
+        ]
+
+    def to_lines(self) -> list[Line]:
+        points = self.points
+        return [Line(points[start], points[end], layer=self.layer) for start, end in self.segments()]
+
+    def to_tuple(self):
+        return (tuple(point.to_tuple() for point in self.points), self.closed, self.layer)
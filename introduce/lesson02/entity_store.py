@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+
+from introduce.lesson02.dxf_reader import Tag, decode_points, point_count
+from introduce.lesson02.geometry import Affine
+from introduce.lesson02.entities import Point, Layer, EntityType, DXFEntity, LAYERS, Polyline
+from introduce.lesson02.polylines import DECODERS
+
+VERTEX_COUNT = {
+    "POINT": 1,
+    "LINE": 2,
+    "3DFACE": 4,
+}
+
+LAYER_TYPES = {
+    "POINT": EntityType.POINT,
+    "LINE": EntityType.LINE,
+    "3DFACE": EntityType.E3DFACE,
+    "LWPOLYLINE": EntityType.LINE,
+    "POLYLINE": EntityType.LINE,
+}
+
+ARRAY_FIELDS = (
+    "coordinates",
+    "point_vertices", "point_layers",
+    "line_vertices", "line_layers",
+    "face_vertices", "face_layers",
+    "polyline_vertices", "polyline_sizes", "polyline_closed", "polyline_layers",
+)
+HANDLE_FIELDS = ("point_handles", "line_handles", "face_handles", "polyline_handles")
+
+
+@dataclass
+class EntityStore:
+    """Column storage of parsed entities.
+
+    Vertex coordinates live in one flat float64 array (x, y, z per vertex), entities keep
+    int32 vertex indices and int16 ids into the shared layer table. Handles (group code 5)
+    are kept per entity in the order of the entities, None when the record has none.
+    """
+    coordinates: array = field(default_factory=lambda: array("d"))
+    layers: list[Layer] = field(default_factory=list)
+
+    point_vertices: array = field(default_factory=lambda: array("i"))
+    point_layers: array = field(default_factory=lambda: array("H"))
+    line_vertices: array = field(default_factory=lambda: array("i"))
+    line_layers: array = field(default_factory=lambda: array("H"))
+    face_vertices: array = field(default_factory=lambda: array("i"))
+    face_layers: array = field(default_factory=lambda: array("H"))
+    # a polyline's vertices are contiguous, it keeps its first vertex and the vertex count
+    polyline_vertices: array = field(default_factory=lambda: array("i"))
+    polyline_sizes: array = field(default_factory=lambda: array("i"))
+    polyline_closed: array = field(default_factory=lambda: array("B"))
+    polyline_layers: array = field(default_factory=lambda: array("H"))
+
+    point_handles: list[str | None] = field(default_factory=list)
+    line_handles: list[str | None] = field(default_factory=list)
+    face_handles: list[str | None] = field(default_factory=list)
+    polyline_handles: list[str | None] = field(default_factory=list)
+
+    _layer_ids: dict[tuple[str, int], int] = field(default_factory=dict, repr=False)
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.coordinates) // 3
+
+    def layer_id(self, name: str, layer_type: int) -> int:
+        key = (name, layer_type)
+        layer_id = self._layer_ids.get(key)
+        if layer_id is None:
+            layer_id = self._layer_ids[key] = len(self.layers)
+            self.layers.append(LAYERS.get(name, layer_type))
+        return layer_id
+
+    def add_vertex(self, x: float, y: float, z: float) -> int:
+        self.coordinates.extend((x, y, z))
+        return self.vertex_count - 1
+
+    def vertex(self, index: int) -> tuple[float, float, float]:
+        return self.coordinates[index * 3], self.coordinates[index * 3 + 1], self.coordinates[index * 3 + 2]
+
+    def add_polyline(
+            self, layer_name: str, closed: bool, coordinates: list[float], handle: str | None = None
+    ) -> None:
+        if not coordinates:
+            return
+        self.polyline_vertices.append(self.vertex_count)
+        self.polyline_sizes.append(len(coordinates) // 3)
+        self.coordinates.extend(coordinates)
+        self.polyline_closed.append(closed)
+        self.polyline_layers.append(self.layer_id(layer_name, EntityType.LINE))
+        self.polyline_handles.append(handle)
+
+    def add_record(self, entity_type: str, tags: list[Tag]) -> None:
+        """Adds an entity record straight from its tags, no entity objects are built."""
+        decode = DECODERS.get(entity_type)
+        if decode is not None:
+            decoded = decode(tags)
+            if decoded is not None:
+                layer_name, handle, closed, coordinates = decoded
+                self.add_polyline(layer_name, closed, coordinates, handle)
+            return
+        vertex_count = VERTEX_COUNT[entity_type]
+        values = dict(tags)
+        layer_name = values.get(8, b"0").decode()
+        handle = values.get(5)
+        handle = handle.decode() if handle is not None else None
+        present = point_count(values, vertex_count)
+        coordinates = decode_points(values, present)
+        # a face with a missing corner repeats its last one
+        coordinates.extend(coordinates[-3:] * (vertex_count - present))
+
+        first = self.vertex_count
+        self.coordinates.extend(coordinates)
+        layer_id = self.layer_id(layer_name, LAYER_TYPES[entity_type])
+        if entity_type == "POINT":
+            self.point_vertices.append(first)
+            self.point_layers.append(layer_id)
+            self.point_handles.append(handle)
+        elif entity_type == "LINE":
+            self.line_vertices.extend((first, first + 1))
+            self.line_layers.append(layer_id)
+            self.line_handles.append(handle)
+        else:
+            self.face_vertices.extend(range(first, first + 4))
+            self.face_layers.append(layer_id)
+            self.face_handles.append(handle)
+
+    def add_store(self, other: EntityStore, transform: Affine | None = None, layer_name: str | None = None) -> None:
+        """Appends all entities of `other` with their coordinates mapped by `transform`.
+
+        Entities of `other` on layer "0" move to `layer_name`, like block content does on insert.
+        """
+        offset = self.vertex_count
+        self.coordinates.extend(other.coordinates if transform is None else transform.apply(other.coordinates))
+        layer_ids = [
+            self.layer_id(layer_name if layer_name and layer.name == "0" else layer.name, layer.type)
+            for layer in other.layers
+        ]
+        for vertices, layers in (("point_vertices", "point_layers"), ("line_vertices", "line_layers"),
+                                 ("face_vertices", "face_layers"), ("polyline_vertices", "polyline_layers")):
+            getattr(self, vertices).extend([vertex + offset for vertex in getattr(other, vertices)])
+            getattr(self, layers).extend([layer_ids[layer_id] for layer_id in getattr(other, layers)])
+        self.polyline_sizes.extend(other.polyline_sizes)
+        self.polyline_closed.extend(other.polyline_closed)
+        for handles in HANDLE_FIELDS:
+            getattr(self, handles).extend(getattr(other, handles))
+
+    def __getstate__(self):
+        # layers are stored by name, so a loaded store shares the interned layers
+        state = {name: getattr(self, name) for name in ARRAY_FIELDS + HANDLE_FIELDS}
+        state["layers"] = [(layer.name, layer.type) for layer in self.layers]
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(**{name: state[name] for name in ARRAY_FIELDS + HANDLE_FIELDS})
+        for name, layer_type in state["layers"]:
+            self.layer_id(name, layer_type)
+
+    def make_point(self, vertex: int, layer: Layer, handle: str | None = None) -> Point:
+        return Point(*self.vertex(vertex), layer=layer, handle=handle)
+
+    def to_entities(self) -> dict[str, list[DXFEntity]]:
+        """Returns the same layout as `DXFParser.parse`, lines and faces are views into the store."""
+        return {
+            "POINT": [
+                self.make_point(vertex, self.layers[layer_id], handle)
+                for vertex, layer_id, handle in zip(self.point_vertices, self.point_layers, self.point_handles)
+            ],
+            "LINE": [LineView(self, i) for i in range(len(self.line_layers))],
+            "3DFACE": [E3DFaceView(self, i) for i in range(len(self.face_layers))],
+            "POLYLINE": [
+                Polyline(
+                    self.coordinates[first * 3:(first + size) * 3], self.layers[layer_id], bool(closed), handle
+                )
+                for first, size, closed, layer_id, handle in zip(
+                    self.polyline_vertices, self.polyline_sizes, self.polyline_closed, self.polyline_layers,
+                    self.polyline_handles,
+                )
+            ],
+        }
+
+    @classmethod
+    def from_entities(cls, entities: dict[str, list[DXFEntity]]) -> EntityStore:
+        store = cls()
+        for point in entities.get("POINT", []):
+            store.point_vertices.append(store.add_vertex(point.x, point.y, point.z))
+            store.point_layers.append(store.layer_id(point.layer.name, EntityType.POINT))
+            store.point_handles.append(point.handle)
+        for line in entities.get("LINE", []):
+            store.line_vertices.append(store.add_vertex(line.start.x, line.start.y, line.start.z))
+            store.line_vertices.append(store.add_vertex(line.end.x, line.end.y, line.end.z))
+            store.line_layers.append(store.layer_id(line.layer.name, EntityType.LINE))
+            store.line_handles.append(line.handle)
+        for face in entities.get("3DFACE", []):
+            points = (face.points + face.points[-1:] * 4)[:4]
+            store.face_vertices.extend(store.add_vertex(p.x, p.y, p.z) for p in points)
+            store.face_layers.append(store.layer_id(face.layer.name, EntityType.E3DFACE))
+            store.face_handles.append(face.handle)
+        for polyline in entities.get("POLYLINE", []):
+            store.add_polyline(polyline.layer.name, polyline.closed, polyline.coordinates, polyline.handle)
+        return store
+
+
+class LineView(DXFEntity):
+    """Read-only `Line` stand-in backed by an `EntityStore` row."""
+
+    def __init__(self, store: EntityStore, index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def layer(self) -> Layer:
+        return self.store.layers[self.store.line_layers[self.index]]
+
+    @property
+    def handle(self) -> str | None:
+        return self.store.line_handles[self.index]
+
+    @property
+    def start(self) -> Point:
+        return self.store.make_point(self.store.line_vertices[self.index * 2], self.layer)
+
+    @property
+    def end(self) -> Point:
+        return self.store.make_point(self.store.line_vertices[self.index * 2 + 1], self.layer)
+
+    def to_tuple(self):
+        return (self.start.to_tuple(), self.end.to_tuple(), self.layer)
+
+    def to_dict(self):
+        return {
+            "start": self.start.to_dict(),
+            "end": self.end.to_dict(),
+            "layer": self.layer,
+        }
+
+
+class E3DFaceView(DXFEntity):
+    """Read-only `E3DFace` stand-in backed by an `EntityStore` row."""
+
+    def __init__(self, store: EntityStore, index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def layer(self) -> Layer:
+        return self.store.layers[self.store.face_layers[self.index]]
+
+    @property
+    def handle(self) -> str | None:
+        return self.store.face_handles[self.index]
+
+    @property
+    def points(self) -> list[Point]:
+        layer = self.layer
+        vertices = self.store.face_vertices[self.index * 4:self.index * 4 + 4]
+        return [self.store.make_point(vertex, layer) for vertex in vertices]
+
+    def to_tuple(self):
+        return tuple([point.to_tuple() for point in self.points])
+
+    def is_triangle(self):
+        return len(set(self.points)) == 3
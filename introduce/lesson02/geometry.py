@@ -0,0 +1,102 @@
+import math
+from array import array
+from typing import Sequence
+
+Vector = tuple[float, float, float]
+
+Z_AXIS = (0.0, 0.0, 1.0)
+
+# below this the extrusion is considered parallel to the world Z axis (arbitrary axis algorithm)
+ARBITRARY_AXIS_LIMIT = 1 / 64
+
+
+def _cross(a: Sequence[float], b: Sequence[float]) -> Vector:
+    return a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]
+
+
+def _unit(vector: Sequence[float]) -> Vector:
+    length = math.sqrt(vector[0] ** 2 + vector[1] ** 2 + vector[2] ** 2)
+    return vector[0] / length, vector[1] / length, vector[2] / length
+
+
+def ocs_axes(extrusion: Sequence[float] = Z_AXIS) -> tuple[Vector, Vector, Vector]:
+    """X, Y and Z axes of the object coordinate system with the given extrusion direction."""
+    z_axis = _unit(extrusion)
+    if abs(z_axis[0]) < ARBITRARY_AXIS_LIMIT and abs(z_axis[1]) < ARBITRARY_AXIS_LIMIT:
+        x_axis = _unit(_cross((0.0, 1.0, 0.0), z_axis))
+    else:
+        x_axis = _unit(_cross(Z_AXIS, z_axis))
+    return x_axis, _unit(_cross(z_axis, x_axis)), z_axis
+
+
+def ocs_to_wcs(coordinates: Sequence[float], extrusion: Sequence[float] = Z_AXIS) -> list[float]:
+    """Converts flat (x, y, z, ...) OCS coordinates to world coordinates."""
+    if tuple(extrusion) == Z_AXIS:
+        return list(coordinates)
+    (xx, xy, xz), (yx, yy, yz), (zx, zy, zz) = ocs_axes(extrusion)
+    values = iter(coordinates)
+    result = []
+    for x, y, z in zip(values, values, values):
+        result.extend((x * xx + y * yx + z * zx, x * xy + y * yy + z * zy, x * xz + y * yz + z * zz))
+    return result
+
+
+class Affine:
+    """3D affine transform, a row major 3x4 matrix: x' = m0 x + m1 y + m2 z + m3, ..."""
+    __slots__ = ("m",)
+
+    IDENTITY = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+    def __init__(self, m: Sequence[float] = IDENTITY):
+        self.m = tuple(map(float, m))
+
+    @classmethod
+    def translation(cls, x: float, y: float, z: float) -> "Affine":
+        return cls((1, 0, 0, x, 0, 1, 0, y, 0, 0, 1, z))
+
+    @classmethod
+    def scaling(cls, x: float, y: float, z: float) -> "Affine":
+        return cls((x, 0, 0, 0, 0, y, 0, 0, 0, 0, z, 0))
+
+    @classmethod
+    def rotation_z(cls, angle: float) -> "Affine":
+        """Counterclockwise rotation about the Z axis, `angle` in radians."""
+        cos, sin = math.cos(angle), math.sin(angle)
+        return cls((cos, -sin, 0, 0, sin, cos, 0, 0, 0, 0, 1, 0))
+
+    @classmethod
+    def ocs(cls, extrusion: Sequence[float] = Z_AXIS) -> "Affine":
+        """OCS to WCS transform of the given extrusion direction."""
+        x_axis, y_axis, z_axis = ocs_axes(extrusion)
+        return cls((
+            x_axis[0], y_axis[0], z_axis[0], 0,
+            x_axis[1], y_axis[1], z_axis[1], 0,
+            x_axis[2], y_axis[2], z_axis[2], 0,
+        ))
+
+    def __matmul__(self, other: "Affine") -> "Affine":
+        """The transform applying `other` first and then this one."""
+        a, b = self.m, other.m
+        m = []
+        for row in range(0, 12, 4):
+            r0, r1, r2, r3 = a[row:row + 4]
+            m.extend((
+                r0 * b[0] + r1 * b[4] + r2 * b[8],
+                r0 * b[1] + r1 * b[5] + r2 * b[9],
+                r0 * b[2] + r1 * b[6] + r2 * b[10],
+                r0 * b[3] + r1 * b[7] + r2 * b[11] + r3,
+            ))
+        return Affine(m)
+
+    def apply(self, coordinates: Sequence[float]) -> array:
+        """Transforms flat (x, y, z, ...) coordinates in one pass."""
+        m0, m1, m2, m3, m4, m5, m6, m7, m8, m9, m10, m11 = self.m
+        values = iter(coordinates)
+        result = array("d")
+        for x, y, z in zip(values, values, values):
+            result.extend((
+                m0 * x + m1 * y + m2 * z + m3,
+                m4 * x + m5 * y + m6 * z + m7,
+                m8 * x + m9 * y + m10 * z + m11,
+            ))
+        return result
@@ -0,0 +1,136 @@
+"""Stage timers and counters for a conversion.
+
+Code under measurement takes an `Instrumentation` and wraps its stages in `stage(name)`, counts
+go through `count(name, n)`. Both are called per stage or per batch, never per entity, and the
+default `NULL_INSTRUMENTATION` does nothing, so uninstrumented runs pay only a method call.
+
+    metrics = Instrumentation(sinks=[log_sink(), json_file_sink("metrics.json")])
+    entities = DXFParser(path, instrumentation=metrics).parse()
+    ...
+    metrics.finish()
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator
+
+Sink = Callable[[dict], None]
+
+logger = logging.getLogger(__name__)
+
+
+def log_sink(log: logging.Logger = logger, level: int = logging.INFO) -> Sink:
+    """Logs the report as one line."""
+    def sink(report: dict) -> None:
+        stages = " ".join(f"{name}={seconds:.3f}s" for name, seconds in report["stages"].items())
+        counters = " ".join(f"{name}={value}" for name, value in report["counters"].items())
+        log.log(level, "%s %s", stages, counters)
+    return sink
+
+
+def json_file_sink(path: str) -> Sink:
+    def sink(report: dict) -> None:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    return sink
+
+
+class Instrumentation:
+    """Collects the wall time of named stages and counters, then hands a report to every sink.
+
+    A stage started inside another one is reported as "outer/inner" and its time is part of the
+    outer stage too. `profile` runs cProfile over the stages and adds the slowest functions to
+    the report, `trace_memory` adds the peak traced memory of every stage, inner stages
+    included. Both slow the conversion down noticeably and are off by default.
+    """
+    enabled = True
+    # functions listed from the profile
+    PROFILE_LIMIT = 30
+
+    def __init__(self, sinks: list[Sink] = (), profile: bool = False, trace_memory: bool = False):
+        self.sinks = list(sinks)
+        self.stages: dict[str, float] = {}
+        self.counters = Counter()
+        self.memory: dict[str, int] = {}
+        self.profiler = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        self._path: list[str] = []
+        # peak traced memory of every open stage from before its latest reset, in bytes
+        self._peaks: list[int] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._path.append(name)
+        path = "/".join(self._path)
+        outermost = len(self._path) == 1
+        if outermost and self.profiler is not None:
+            self.profiler.enable()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # the reset would lose the peak the enclosing stage reached so far
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[path] = self.stages.get(path, 0.0) + time.perf_counter() - started
+            if self.trace_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                self.memory[path] = max(self.memory.get(path, 0), peak // 1024)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            if outermost and self.profiler is not None:
+                self.profiler.disable()
+            self._path.pop()
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def report(self) -> dict:
+        report = {
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+        if self.trace_memory:
+            report["peak_memory_kb"] = dict(self.memory)
+        if self.profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(self.PROFILE_LIMIT)
+            report["profile"] = out.getvalue()
+        return report
+
+    def finish(self) -> dict:
+        """Sends the report to the sinks and returns it."""
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        report = self.report()
+        for sink in self.sinks:
+            sink(report)
+        return report
+
+
+class NullInstrumentation(Instrumentation):
+    enabled = False
+
+    def __init__(self):
+        super().__init__()
+        self._stage = nullcontext()
+
+    def stage(self, name: str):
+        return self._stage
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
@@ -0,0 +1,93 @@
+from introduce.lesson02.dxf_reader import Tag
+from introduce.lesson02.geometry import ocs_to_wcs
+
+CLOSED = 1
+POLYLINE_3D = 8
+POLYGON_MESH = 16
+POLYFACE_MESH = 64
+# a polyface mesh VERTEX holding face indices instead of a position
+FACE_RECORD = 128
+
+# layer name, handle, closed, world coordinates (x, y, z per vertex)
+PolylineData = tuple[str, str | None, bool, list[float]]
+
+
+def decode_lwpolyline(tags: list[Tag]) -> PolylineData:
+    """Vertices of an LWPOLYLINE, 2D points on the elevation (38) plane of its OCS.
+
+    Bulges (42) are ignored, arcs are exported as straight segments.
+    """
+    layer = "0"
+    handle = None
+    flags = 0
+    elevation = 0.0
+    extrusion = [0.0, 0.0, 1.0]
+    coordinates = []
+    for code, value in tags:
+        if code == 10:
+            coordinates.extend((float(value), 0.0, 0.0))
+        elif code == 20:
+            coordinates[-2] = float(value)
+        elif code == 38:
+            elevation = float(value)
+        elif code == 70:
+            flags = int(value)
+        elif code == 8:
+            layer = value.decode()
+        elif code == 5:
+            handle = value.decode()
+        elif code in (210, 220, 230):
+            extrusion[code // 10 - 21] = float(value)
+    if elevation:
+        coordinates[2::3] = [elevation] * (len(coordinates) // 3)
+    return layer, handle, bool(flags & CLOSED), ocs_to_wcs(coordinates, extrusion)
+
+
+def decode_polyline(tags: list[Tag]) -> PolylineData | None:
+    """Vertices of a POLYLINE record joined with its VERTEX records by `join_sequences`.
+
+    2D polylines lie on the elevation (30) plane of their OCS, 3D polylines hold world
+    coordinates. Polygon and polyface meshes are not bars and give None.
+    """
+    layer = "0"
+    handle = None
+    flags = 0
+    elevation = 0.0
+    extrusion = [0.0, 0.0, 1.0]
+    vertices = []
+    vertex = None
+    for code, value in tags:
+        if code == 0:
+            vertex = [0.0, 0.0, 0.0, 0]
+            vertices.append(vertex)
+        elif vertex is not None:
+            if code in (10, 20, 30):
+                vertex[code // 10 - 1] = float(value)
+            elif code == 70:
+                vertex[3] = int(value)
+        elif code == 30:
+            elevation = float(value)
+        elif code == 70:
+            flags = int(value)
+        elif code == 8:
+            layer = value.decode()
+        elif code == 5:
+            handle = value.decode()
+        elif code in (210, 220, 230):
+            extrusion[code // 10 - 21] = float(value)
+    if flags & (POLYGON_MESH | POLYFACE_MESH):
+        return None
+    coordinates = []
+    for x, y, z, vertex_flags in vertices:
+        if not vertex_flags & FACE_RECORD:
+            coordinates.extend((x, y, z))
+    if not flags & POLYLINE_3D:
+        coordinates[2::3] = [elevation] * (len(coordinates) // 3)
+        coordinates = ocs_to_wcs(coordinates, extrusion)
+    return layer, handle, bool(flags & CLOSED), coordinates
+
+
+DECODERS = {
+    "LWPOLYLINE": decode_lwpolyline,
+    "POLYLINE": decode_polyline,
+}
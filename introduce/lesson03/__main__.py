@@ -0,0 +1,141 @@
+"""Command line entry point: python -m introduce.lesson03 convert drawings/*.dxf -j 4
+
+python -m introduce.lesson03 benchmark --save records a baseline, later runs report the
+stages that got slower than it and exit with 1.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from introduce.lesson03.benchmark import DEFAULT_SIZES, LARGE_SIZE, SIZES, BenchmarkOptions, load_baseline, \
+    save_baseline
+from introduce.lesson03.benchmark import run as benchmark
+from introduce.lesson03.convert import ConvertOptions, convert
+from introduce.lesson03.synthetic import MODELS, model, write_dxf
+
+
+def expand_paths(patterns: list[str]) -> list[str]:
+    """Expands wildcards the shell left alone (e.g. on Windows), plain paths are kept as given."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches or [pattern])
+    return paths
+
+
+def run_convert(args: argparse.Namespace) -> int:
+    options = ConvertOptions(
+        output_dir=args.output_dir,
+        split_bars=args.split_bars,
+        remove_duplicates=args.remove_duplicates,
+        renumber=args.renumber,
+        metrics=args.metrics,
+        profile=args.profile,
+        trace_memory=args.trace_memory,
+    )
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    # one process per drawing, so peak memory is per drawing and one crash can't leak into the next file
+    with ProcessPoolExecutor(args.jobs, max_tasks_per_child=1) as executor:
+        futures = {executor.submit(convert, path, options): path for path in expand_paths(args.files)}
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as error:
+                report = {"file": futures[future], "status": "error", "error": f"{type(error).__name__}: {error}"}
+            failed += report["status"] != "ok"
+            print(json.dumps(report), flush=True)
+    return 1 if failed else 0
+
+
+def run_generate(args: argparse.Namespace) -> int:
+    count = write_dxf(args.output, model(args.model, args.entities))
+    print(json.dumps({"file": args.output, "model": args.model, "entities": count}))
+    return 0
+
+
+def run_benchmark(args: argparse.Namespace) -> int:
+    sizes = list(args.sizes)
+    if args.large:
+        sizes += [size for size in SIZES if size >= LARGE_SIZE and size not in sizes]
+    options = BenchmarkOptions(
+        sizes=tuple(sizes),
+        models=tuple(args.models),
+        directory=args.directory,
+        repeat=args.repeat,
+        threshold=args.threshold,
+        workers=tuple(args.workers or ()),
+    )
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressed = 0
+    for name, result, found in benchmark(options, baseline):
+        results[name] = result
+        regressed += bool(found)
+        print(json.dumps({"case": name, **result, "regressions": found}), flush=True)
+    if args.save:
+        # cases not run this time keep their old numbers
+        save_baseline(args.baseline, {**baseline, **results})
+    return 1 if regressed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m introduce.lesson03")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser(
+        "convert", help="convert DXF drawings to LIRA, one JSON report line per drawing"
+    )
+    convert_parser.add_argument("files", nargs="+", help="DXF files, wildcards are expanded")
+    convert_parser.add_argument("-j", "--jobs", type=int, default=1, help="drawings converted in parallel")
+    convert_parser.add_argument(
+        "-o", "--output-dir", help="where to write the .txt files, next to each drawing by default"
+    )
+    convert_parser.add_argument("--split-bars", action="store_true", help="split bars at nodes and crossings")
+    convert_parser.add_argument("--remove-duplicates", action="store_true", help="drop duplicate elements")
+    convert_parser.add_argument("--renumber", action="store_true", help="renumber nodes to reduce the bandwidth")
+    convert_parser.add_argument(
+        "--metrics", action="store_true", help="add timers and counters of every parser and exporter stage"
+    )
+    convert_parser.add_argument("--profile", action="store_true", help="add a cProfile summary to the metrics")
+    convert_parser.add_argument(
+        "--trace-memory", action="store_true", help="add the peak traced memory of every stage to the metrics"
+    )
+    convert_parser.set_defaults(handler=run_convert)
+
+    generate_parser = commands.add_parser("generate", help="write a synthetic DXF model")
+    generate_parser.add_argument("output", help="DXF file to write")
+    generate_parser.add_argument("-n", "--entities", type=int, default=10_000, help="about this many entities")
+    generate_parser.add_argument("-m", "--model", choices=MODELS, default="frame")
+    generate_parser.set_defaults(handler=run_generate)
+
+    benchmark_parser = commands.add_parser(
+        "benchmark", help="time every conversion stage on synthetic models, one JSON line per case"
+    )
+    benchmark_parser.add_argument("-n", "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    benchmark_parser.add_argument(
+        "--large", action="store_true", help="also run the 1M entity models, they take minutes per case"
+    )
+    benchmark_parser.add_argument("-m", "--models", choices=MODELS, nargs="+", default=list(MODELS))
+    benchmark_parser.add_argument("-d", "--directory", default="benchmark", help="where the models are generated")
+    benchmark_parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per case, the best is kept")
+    benchmark_parser.add_argument("-b", "--baseline", default="benchmark/baseline.json")
+    benchmark_parser.add_argument("--save", action="store_true", help="store this run as the new baseline")
+    benchmark_parser.add_argument(
+        "--threshold", type=float, default=0.2, help="slowdown reported as a regression, 0.2 is 20%%"
+    )
+    benchmark_parser.add_argument(
+        "-w", "--workers", type=int, nargs="+", help="also time the parse with these numbers of worker processes"
+    )
+    benchmark_parser.set_defaults(handler=run_benchmark)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Conversion benchmark on synthetic models, compared against a saved JSON baseline.
+
+Every case is converted in a fresh process, so the peak memory of one case does not carry
+over to the next. Stage times are the best of the repeats, throughput is entities per second.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from introduce.lesson02.dxf_parser import DXFParser, usable_cpus
+from introduce.lesson03.convert import ConvertOptions, convert
+from introduce.lesson03.synthetic import model, write_dxf
+
+STAGES = ("parse", "filter", "dof", "export")
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# sizes from here on take minutes per case, they only run when asked for
+LARGE_SIZE = 1_000_000
+DEFAULT_SIZES = tuple(size for size in SIZES if size < LARGE_SIZE)
+# stage changes below this many seconds are noise at the small sizes
+MIN_TIME_DELTA = 0.005
+
+
+@dataclass
+class BenchmarkOptions:
+    sizes: tuple[int, ...] = DEFAULT_SIZES
+    models: tuple[str, ...] = ("frame", "shell")
+    # generated drawings and their LIRA output, kept between runs
+    directory: str = "benchmark"
+    repeat: int = 3
+    # slowdown over the baseline reported as a regression, 0.2 is 20 %
+    threshold: float = 0.2
+    # worker counts to time DXFParser.parse with, not timed when empty
+    workers: tuple[int, ...] = ()
+
+
+def case_path(directory: str, kind: str, size: int) -> str:
+    """Writes the model on first use."""
+    path = os.path.join(directory, f"{kind}-{size}.dxf")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_dxf(path, model(kind, size))
+    return path
+
+
+def measure(path: str, repeat: int) -> dict:
+    stages = {}
+    peak_memory = None
+    for _ in range(max(repeat, 1)):
+        with ProcessPoolExecutor(1) as executor:
+            report = executor.submit(convert, path, ConvertOptions()).result()
+        if report["status"] != "ok":
+            raise RuntimeError(f"{path}: {report['stage']}: {report['error']}")
+        for stage in STAGES:
+            stages[stage] = min(stages.get(stage, report["stages"][stage]), report["stages"][stage])
+        if report["peak_memory_kb"] is not None:
+            peak_memory = max(peak_memory or 0, report["peak_memory_kb"])
+    entities = sum(report["entities"].values())
+    return {
+        "entities": entities,
+        "stages": stages,
+        "throughput": {stage: round(entities / seconds) if seconds else None for stage, seconds in stages.items()},
+        "total": round(sum(stages.values()), 6),
+        "peak_memory_kb": peak_memory,
+    }
+
+
+def time_parse(path: str, workers: int) -> float:
+    started = time.perf_counter()
+    DXFParser(path, workers=workers).parse()
+    return time.perf_counter() - started
+
+
+def measure_workers(path: str, workers: tuple[int, ...], repeat: int) -> dict[str, float]:
+    """Best parse time for every worker count, each run in a fresh process.
+
+    The parser uses at most `usable_cpus()` processes, so counts above it time the same as it.
+    """
+    times = {}
+    for count in workers:
+        for _ in range(max(repeat, 1)):
+            with ProcessPoolExecutor(1) as executor:
+                seconds = executor.submit(time_parse, path, count).result()
+            times[str(count)] = round(min(times.get(str(count), seconds), seconds), 6)
+    return times
+
+
+def regressions(result: dict, baseline: dict | None, threshold: float) -> list[str]:
+    """Stages, and the peak memory, worse than the baseline by more than `threshold`."""
+    if baseline is None:
+        return []
+    found = []
+    for stage, seconds in result["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before is not None and seconds > before * (1 + threshold) and seconds - before > MIN_TIME_DELTA:
+            found.append(f"{stage}: {before:.3f}s -> {seconds:.3f}s")
+    before, after = baseline.get("peak_memory_kb"), result["peak_memory_kb"]
+    if before and after and after > before * (1 + threshold):
+        found.append(f"peak memory: {before} KB -> {after} KB")
+    return found
+
+
+def load_baseline(path: str | None) -> dict:
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def run(options: BenchmarkOptions, baseline: dict):
+    """Yields (case name, result, regressions) for every model and size."""
+    for kind in options.models:
+        for size in options.sizes:
+            name = f"{kind}-{size}"
+            path = case_path(options.directory, kind, size)
+            result = measure(path, options.repeat)
+            if options.workers:
+                result["parse_workers"] = measure_workers(path, options.workers, options.repeat)
+                result["cpus"] = usable_cpus()
+            yield name, result, regressions(result, baseline.get(name), options.threshold)
@@ -1,10 +0,0 @@
-TEMPLATE = """(0/1;csv2lira/2;5/39; 1:'dead load';)(1/
-{drawing_objects}
-)(3/
-{layers}
-(4/
-{unique_points}
-)(6/1 16 3 1 1/)
-(7/1 0.0 0.0 0.0 0.0 /)
-(8/0 0 0 0 0 0 0/)
-"""
\ No newline at end of file
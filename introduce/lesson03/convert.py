@@ -0,0 +1,96 @@
+import os
+import time
+from dataclasses import dataclass
+
+from introduce.lesson02.dxf_parser import DXFParser
+from introduce.lesson02.instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from introduce.lesson03.lira_exporter import LiraExporter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+@dataclass
+class ConvertOptions:
+    # next to the drawing when not set
+    output_dir: str | None = None
+    split_bars: bool = False
+    remove_duplicates: bool = False
+    renumber: bool = False
+    # adds the instrumentation report of the parser and exporter as "metrics"
+    metrics: bool = False
+    profile: bool = False
+    trace_memory: bool = False
+
+
+def output_path(path: str, output_dir: str | None = None) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir if output_dir is not None else os.path.dirname(path), stem + ".txt")
+
+
+def peak_memory_kb() -> int | None:
+    """Peak resident memory of this process."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def convert(path: str, options: ConvertOptions = ConvertOptions()) -> dict:
+    """Converts one drawing to LIRA, returns a JSON-ready report.
+
+    The report holds the wall time of every stage in seconds, entity counts and the peak
+    memory. A failing stage does not raise, the report gets its name and the error instead.
+    """
+    report = {"file": path, "status": "ok", "stages": {}}
+    instrumentation = NULL_INSTRUMENTATION
+    if options.metrics or options.profile or options.trace_memory:
+        instrumentation = Instrumentation(profile=options.profile, trace_memory=options.trace_memory)
+    stages = report["stages"]
+    stage = "parse"
+    started = time.perf_counter()
+
+    def done(next_stage: str | None = None):
+        nonlocal stage, started
+        now = time.perf_counter()
+        stages[stage] = round(now - started, 6)
+        stage, started = next_stage, now
+
+    try:
+        entities = DXFParser(path, instrumentation=instrumentation).parse()
+        report["entities"] = {entity_type: len(items) for entity_type, items in entities.items()}
+        lira = LiraExporter(
+            points=entities["POINT"],
+            lines=entities["LINE"],
+            e3d_faces=entities["3DFACE"],
+            polylines=entities["POLYLINE"],
+            renumber=options.renumber,
+            instrumentation=instrumentation,
+        )
+        done("filter")
+        lira.filter_by_layer_template()
+        if options.split_bars:
+            done("split_bars")
+            report["bars_added"] = lira.split_bars()
+        if options.remove_duplicates:
+            done("remove_duplicates")
+            report["duplicates_removed"] = sum(lira.remove_duplicate_elements().duplicates.values())
+        done("dof")
+        lira.calculate_dof_points()
+        done("export")
+        report["output"] = output_path(path, options.output_dir)
+        lira.export_partial(report["output"])
+        report["nodes"] = len(lira.nodes[0])
+        segments = sum(1 for segments in lira.polyline_nodes for start, end in segments if start != end)
+        report["elements"] = len(lira.lines) + segments + len(lira.e3d_faces)
+        report["supports"] = len(lira.points)
+        done()
+    except Exception as error:
+        report["status"] = "error"
+        report["stage"] = stage
+        report["error"] = f"{type(error).__name__}: {error}"
+    report["peak_memory_kb"] = peak_memory_kb()
+    if instrumentation.enabled:
+        report["metrics"] = instrumentation.finish()
+    return report
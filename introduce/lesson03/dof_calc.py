@@ -1,23 +1,20 @@
-import math
-from introduce.lesson02.entities import Point, Line, Layer, EntityType, E3DFace
+from itertools import chain
 
-
-def distance(p1: Point, p2: Point):
-    return math.dist(p1.to_tuple(), p2.to_tuple())
+from introduce.lesson02.entities import Point, Line, EntityType, E3DFace, LAYERS
+from introduce.lesson02.instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from introduce.lesson03.kernels import points_on_segments, points_in_quads, prepare_quads, quad_coordinates
+from introduce.lesson03.spatial_index import GridIndex
 
 
 def is_dof_point(line: Line, p2: Point):
-    line_length = distance(line.start, line.end)
-    start_and_point_length = distance(line.start, p2)
-    end_and_length = distance(line.end, p2)
-    return line_length == start_and_point_length + end_and_length
+    return bool(points_on_segments(p2.to_tuple(), line.start.to_tuple(), line.end.to_tuple(), p2.accuracy))
 
 
 def get_dof_points_from_lines_by_dof_line(lines: list[Line], dof_line: Line) -> list[Point]:
     dof_points = []
 
     for line in lines:
-        layer = Layer(name=dof_line.layer.name, type=EntityType.POINT)
+        layer = LAYERS.get(dof_line.layer.name, EntityType.POINT)
         if is_dof_point(dof_line, line.start):
             dof_points.append(Point(line.start.x, line.start.y, line.start.z, layer))
         if is_dof_point(dof_line, line.end):
@@ -28,7 +25,7 @@ def get_dof_points_from_lines_by_dof_line(lines: list[Line], dof_line: Line) ->
 def get_dof_points_from_faces_by_dof_line(faces: list[E3DFace], dof_line: Line) -> list[Point]:
     dof_points = []
     for face in faces:
-        layer = Layer(name=dof_line.layer.name, type=EntityType.POINT)
+        layer = LAYERS.get(dof_line.layer.name, EntityType.POINT)
         for point in face.points:
             if is_dof_point(dof_line, point):
                 dof_points.append(Point(point.x, point.y, point.z, layer))
@@ -49,42 +46,16 @@ def get_dof_points_from_lines_by_dof_lines(lines: list[Line], dof_lines: list[Li
     return dof_points
 
 
-def triangle_area(point1: Point, point2: Point, point3: Point) -> float:
-    a_length = distance(point1, point2)
-    b_length = distance(point1, point3)
-    c_length = distance(point2, point3)
-    perimeter = (a_length + b_length + c_length) / 2
-    return math.sqrt(perimeter * (perimeter - a_length) * (perimeter - b_length) * (perimeter - c_length))
-
-
-def get_face_area(face: E3DFace) -> float:
-    a_point = face.points[0]
-    b_point = face.points[1]
-    c_point = face.points[3]
-    d_point = face.points[2]
-    return triangle_area(a_point, b_point, c_point) + triangle_area(b_point, c_point, d_point)
-
-
 def is_dof_point_with_3d_face(face: E3DFace, point: Point):
-    face_area = get_face_area(face)
-    a_point = face.points[0]
-    b_point = face.points[1]
-    c_point = face.points[3]
-    d_point = face.points[2]
-    area_triangles = (
-        triangle_area(a_point, point, c_point) +
-        triangle_area(a_point, point, b_point) +
-        triangle_area(b_point, point, d_point) +
-        triangle_area(c_point, point, d_point)
-    )
-    return abs(area_triangles - face_area) <= point.accuracy
+    corners = quad_coordinates([p.to_tuple() for p in face.points])
+    return bool(points_in_quads(point.to_tuple(), corners, point.accuracy))
 
 
 def get_dof_points_from_lines_with_dof_3dface(lines: list[Line], dof_face: E3DFace) -> list[Point]:
     dof_points = []
 
     for line in lines:
-        layer = Layer(name=dof_face.layer.name, type=EntityType.POINT)
+        layer = LAYERS.get(dof_face.layer.name, EntityType.POINT)
         if is_dof_point_with_3d_face(dof_face, line.start):
             dof_points.append(Point(line.start.x, line.start.y, line.start.z, layer))
         if is_dof_point_with_3d_face(dof_face, line.end):
@@ -102,7 +73,7 @@ def get_dof_points_from_lines_with_dof_3d_faces(lines: list[Line], dof_faces: li
 def get_dof_points_from_with_dof_3d_face(faces: list[E3DFace], dof_face: E3DFace) -> list[Point]:
     dof_points = []
     for face in faces:
-        layer = Layer(name=dof_face.layer.name, type=EntityType.POINT)
+        layer = LAYERS.get(dof_face.layer.name, EntityType.POINT)
         for point in face.points:
             if is_dof_point_with_3d_face(dof_face, point):
                 dof_points.append(Point(point.x, point.y, point.z, layer))
@@ -114,3 +85,49 @@ def get_dof_points_from_with_dof_3d_faces(faces: list[E3DFace], dof_faces: list[
     for dof_face in dof_faces:
         dof_points.extend(get_dof_points_from_with_dof_3d_face(faces, dof_face))
     return dof_points
+
+
+def match_supports(
+        nodes: GridIndex, dof_entity: Line | E3DFace, instrumentation: Instrumentation = NULL_INSTRUMENTATION
+) -> list[int]:
+    """Returns the indexed nodes lying on a DOF line or DOF 3DFACE."""
+    if hasattr(dof_entity, "points"):
+        corners = [point.to_tuple() for point in dof_entity.points]
+        accuracy = dof_entity.points[0].accuracy
+    else:
+        corners = [dof_entity.start.to_tuple(), dof_entity.end.to_tuple()]
+        accuracy = dof_entity.start.accuracy
+    candidates = nodes.query_points(corners, accuracy)
+    coordinates = list(chain.from_iterable(nodes.coordinates[i * 3:i * 3 + 3] for i in candidates))
+    if len(corners) == 2:
+        pairs = points_on_segments(coordinates, corners[0], corners[1], accuracy)
+    else:
+        triangles = prepare_quads(quad_coordinates(corners))
+        pairs = points_in_quads(coordinates, triangles, accuracy)
+    instrumentation.count("dof_candidates", len(candidates))
+    instrumentation.count("dof_matches", len(pairs))
+    return [candidates[index] for index, _ in pairs]
+
+
+def get_dof_points_by_dof_lines(
+        nodes: GridIndex, dof_lines: list[Line], instrumentation: Instrumentation = NULL_INSTRUMENTATION
+) -> list[Point]:
+    """Matches DOF lines against the indexed nodes inside each line's padded bounding box."""
+    dof_points = []
+    for dof_line in dof_lines:
+        layer = LAYERS.get(dof_line.layer.name, EntityType.POINT)
+        for index in match_supports(nodes, dof_line, instrumentation):
+            dof_points.append(Point(*nodes.coordinates[index * 3:index * 3 + 3], layer))
+    return dof_points
+
+
+def get_dof_points_by_dof_3d_faces(
+        nodes: GridIndex, dof_faces: list[E3DFace], instrumentation: Instrumentation = NULL_INSTRUMENTATION
+) -> list[Point]:
+    """Matches DOF faces against the indexed nodes inside each face's padded bounding box."""
+    dof_points = []
+    for dof_face in dof_faces:
+        layer = LAYERS.get(dof_face.layer.name, EntityType.POINT)
+        for index in match_supports(nodes, dof_face, instrumentation):
+            dof_points.append(Point(*nodes.coordinates[index * 3:index * 3 + 3], layer))
+    return dof_points
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import os
+import pickle
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Iterable
+
+from introduce.lesson02.entities import EntityType, DXFEntity, LAYERS
+from introduce.lesson03.dof_calc import match_supports
+from introduce.lesson03.lira_writer import LiraWriter, format_bars, format_face, format_nodes, dof_code
+from introduce.lesson03.node_merge import NodeMerger
+from introduce.lesson03.spatial_index import GridIndex
+
+# bump when the layout of ExportState changes
+STATE_VERSION = 1
+
+EntityKey = tuple
+
+
+def entity_key(entity: DXFEntity) -> EntityKey:
+    """Identifies an entity by its type, handle (group code 5), layer and exact geometry.
+
+    An edited entity keeps its handle but changes its geometry, so it gets a new key.
+    """
+    handle = getattr(entity, "handle", None)
+    if hasattr(entity, "coordinates"):
+        return "POLYLINE", handle, entity.layer.name, (entity.closed, tuple(entity.coordinates))
+    if hasattr(entity, "points"):
+        return "3DFACE", handle, entity.layer.name, tuple(point.to_tuple() for point in entity.points)
+    if hasattr(entity, "start"):
+        return "LINE", handle, entity.layer.name, (entity.start.to_tuple(), entity.end.to_tuple())
+    return "POINT", handle, entity.layer.name, (entity.to_tuple(),)
+
+
+@dataclass
+class ExportState:
+    """What an incremental export keeps between runs."""
+    version: int = STATE_VERSION
+    merger: NodeMerger = field(default_factory=NodeMerger)
+    # entity key -> indices of its vertices' nodes in `merger`
+    elements: dict[EntityKey, tuple[int, ...]] = field(default_factory=dict)
+    # DOF entity key -> nodes in `merger` it supports
+    supports: dict[EntityKey, set[int]] = field(default_factory=dict)
+    # nodes below this index were already tested against every DOF entity in `supports`
+    checked_nodes: int = 0
+
+
+@dataclass
+class IncrementalStats:
+    added: int = 0
+    removed: int = 0
+    kept: int = 0
+    new_nodes: int = 0
+    dof_added: int = 0
+    dof_removed: int = 0
+    rebuilt: bool = False
+
+
+class IncrementalExporter:
+    """Re-exports a drawing to LIRA reusing the previous run's nodes, elements and supports.
+
+    Only entities added since the previous run are merged into nodes, only new nodes and new
+    DOF entities are matched for supports. Node numbers of unchanged elements keep their
+    relative order; numbers are compacted over the nodes still in use. Like
+    `LiraExporter.calculate_dof_points` only nodes of elements get supports, not the nodes of
+    POINT entities alone. The exporter must be filtered with `filter_by_layer_template` and
+    not run through `calculate_dof_points`.
+    """
+    # rebuild from scratch once most of the remembered nodes are no longer used
+    STALE_NODE_RATIO = 2
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+
+    def load_state(self) -> ExportState:
+        try:
+            with open(self.state_path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return ExportState()
+        if not isinstance(state, ExportState) or state.version != STATE_VERSION:
+            return ExportState()
+        return state
+
+    def save_state(self, state: ExportState) -> None:
+        temporary_path = self.state_path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.state_path)
+
+    def export(self, lira, filename: str) -> IncrementalStats:
+        state = self.load_state()
+        stats, point_nodes = self.update(state, lira)
+        element_nodes = self.element_nodes(state, lira)
+        used = self.used_nodes(element_nodes, point_nodes)
+        if len(state.merger) > self.STALE_NODE_RATIO * max(len(used), 1):
+            state = ExportState()
+            stats, point_nodes = self.update(state, lira)
+            stats.rebuilt = True
+            element_nodes = self.element_nodes(state, lira)
+            used = self.used_nodes(element_nodes, point_nodes)
+        self.write(state, lira, point_nodes, used, element_nodes, filename)
+        self.save_state(state)
+        return stats
+
+    def update(self, state: ExportState, lira) -> tuple[IncrementalStats, list[int]]:
+        stats = IncrementalStats()
+        merger = state.merger
+
+        current = {entity_key(entity): entity for entity in chain(lira.lines, lira.e3d_faces, lira.polylines)}
+        for key in state.elements.keys() - current.keys():
+            del state.elements[key]
+            stats.removed += 1
+        first_new_node = len(merger)
+        for key, entity in current.items():
+            if key in state.elements:
+                stats.kept += 1
+                continue
+            vertices = (entity.start, entity.end) if key[0] == "LINE" else entity.points
+            state.elements[key] = tuple(merger.add(point.x, point.y, point.z) for point in vertices)
+            stats.added += 1
+        point_nodes = [merger.add(point.x, point.y, point.z) for point in lira.points]
+        stats.new_nodes = len(merger) - first_new_node
+
+        dof_entities = {entity_key(entity): entity for entity in chain(lira.dof_lines, lira.dof_3dfaces)}
+        for key in state.supports.keys() - dof_entities.keys():
+            del state.supports[key]
+            stats.dof_removed += 1
+        if len(merger) > state.checked_nodes and state.supports:
+            new_nodes = GridIndex(merger.coordinates[state.checked_nodes * 3:])
+            for key, nodes in state.supports.items():
+                nodes.update(index + state.checked_nodes for index in match_supports(new_nodes, dof_entities[key]))
+        added = [key for key in dof_entities if key not in state.supports]
+        if added:
+            all_nodes = GridIndex(merger.coordinates)
+            for key in added:
+                state.supports[key] = set(match_supports(all_nodes, dof_entities[key]))
+                stats.dof_added += 1
+        state.checked_nodes = len(merger)
+        return stats, point_nodes
+
+    @staticmethod
+    def element_nodes(state: ExportState, lira) -> set[int]:
+        """Nodes used by the current elements."""
+        keys = (entity_key(entity) for entity in chain(lira.lines, lira.e3d_faces, lira.polylines))
+        return set(chain.from_iterable(state.elements[key] for key in keys))
+
+    @staticmethod
+    def used_nodes(element_nodes: set[int], point_nodes: list[int]) -> dict[int, int]:
+        """Maps the nodes used by the current elements and points to their output numbers."""
+        used = element_nodes.union(point_nodes)
+        return {node: number for number, node in enumerate(sorted(used), start=1)}
+
+    def write(
+            self, state: ExportState, lira, point_nodes: list[int], used: dict[int, int], supported: set[int],
+            filename: str
+    ) -> None:
+        """`supported` are the nodes that may get supports, the nodes of the current elements."""
+        support_layers = {key: LAYERS.get(key[2], EntityType.POINT) for key in state.supports}
+        layers = dict.fromkeys(chain(
+            (point.layer for point in lira.points),
+            (line.layer for line in lira.lines),
+            (face.layer for face in lira.e3d_faces),
+            (polyline.layer for polyline in lira.polylines),
+            support_layers.values(),
+        ))
+        layers = {layer: i + 1 for i, layer in enumerate(layers)}
+
+        def element_nodes(entity) -> tuple[int, ...]:
+            return tuple(used[node] for node in state.elements[entity_key(entity)])
+
+        def polyline_rows(polyline) -> Iterable[str]:
+            nodes = element_nodes(polyline)
+            segments = [(nodes[start], nodes[end]) for start, end in polyline.segments() if nodes[start] != nodes[end]]
+            return format_bars([layers[polyline.layer]] * len(segments), segments)
+
+        coordinates = state.merger.coordinates
+        with LiraWriter(filename) as writer:
+            writer.write_section(1, chain(
+                format_bars((layers[line.layer] for line in lira.lines), map(element_nodes, lira.lines)),
+                chain.from_iterable(map(polyline_rows, lira.polylines)),
+                (format_face(layers[face.layer], element_nodes(face)) for face in lira.e3d_faces),
+            ))
+            writer.write_section(3, (layer.to_lira_format(i) for layer, i in layers.items()))
+            writer.write_section(4, format_nodes(chain.from_iterable(
+                coordinates[node * 3:node * 3 + 3] for node in used
+            )))
+            writer.write_section(5, chain(
+                (
+                    f"{used[node]} {dof_code(point.layer.unique_name)}/\n"
+                    for point, node in zip(lira.points, point_nodes)
+                ),
+                (
+                    f"{used[node]} {dof_code(support_layers[key].unique_name)}/\n"
+                    for key, nodes in state.supports.items() for node in sorted(nodes) if node in supported
+                ),
+            ))
+
@@ -0,0 +1,197 @@
+import math
+from itertools import chain
+from typing import Callable, Sequence
+
+from introduce.lesson03.spatial_index import GridIndex
+
+# point-element pairs from which the points are bucketed in a grid first, below it testing all is cheaper
+GRID_MIN_PAIRS = 4096
+
+
+def _sub(a: Sequence[float], b: Sequence[float]) -> tuple[float, float, float]:
+    return a[0] - b[0], a[1] - b[1], a[2] - b[2]
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _cross(a: Sequence[float], b: Sequence[float]) -> tuple[float, float, float]:
+    return a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]
+
+
+def _xyz(coordinates: Sequence[float], index: int) -> tuple[float, float, float]:
+    return coordinates[index * 3], coordinates[index * 3 + 1], coordinates[index * 3 + 2]
+
+
+def segment_distance(point: Sequence[float], start: Sequence[float], end: Sequence[float]) -> float:
+    """Distance from the point to the closest point of the segment."""
+    direction = _sub(end, start)
+    length2 = _dot(direction, direction)
+    offset = _sub(point, start)
+    t = 0.0 if length2 == 0 else min(max(_dot(offset, direction) / length2, 0.0), 1.0)
+    return math.dist(point, (start[0] + direction[0] * t, start[1] + direction[1] * t, start[2] + direction[2] * t))
+
+
+def line_distance(point: Sequence[float], start: Sequence[float], end: Sequence[float]) -> float:
+    """Distance from the point to the infinite line through start and end."""
+    direction = _sub(end, start)
+    length2 = _dot(direction, direction)
+    if length2 == 0:
+        return math.dist(point, start)
+    normal = _cross(direction, _sub(point, start))
+    return math.sqrt(_dot(normal, normal) / length2)
+
+
+def segment_crossing(
+        a: Sequence[float], b: Sequence[float], c: Sequence[float], d: Sequence[float], tolerance: float
+) -> tuple[float, float, tuple[float, float, float]] | None:
+    """Where segment a-b passes segment c-d within `tolerance`.
+
+    Returns the parameters of the closest points along both segments (0 at a and c, 1 at b
+    and d) and the point halfway between them, or None. Parallel segments never cross.
+    """
+    u, v, w = _sub(b, a), _sub(d, c), _sub(a, c)
+    uu, uv, vv = _dot(u, u), _dot(u, v), _dot(v, v)
+    denominator = uu * vv - uv * uv
+    if uu == 0 or vv == 0 or denominator <= 1e-12 * uu * vv:
+        return None
+    uw, vw = _dot(u, w), _dot(v, w)
+    s = (uv * vw - vv * uw) / denominator
+    t = (uu * vw - uv * uw) / denominator
+    s_margin, t_margin = tolerance / math.sqrt(uu), tolerance / math.sqrt(vv)
+    if not (-s_margin <= s <= 1 + s_margin and -t_margin <= t <= 1 + t_margin):
+        return None
+    p = (a[0] + u[0] * s, a[1] + u[1] * s, a[2] + u[2] * s)
+    q = (c[0] + v[0] * t, c[1] + v[1] * t, c[2] + v[2] * t)
+    if math.dist(p, q) > tolerance:
+        return None
+    return s, t, ((p[0] + q[0]) / 2, (p[1] + q[1]) / 2, (p[2] + q[2]) / 2)
+
+
+def point_candidates(
+        points: Sequence[float], element_count: int, padding: float
+) -> Callable[[Sequence[Sequence[float]]], Sequence[int]]:
+    """Returns a function giving, in index order, the points to test against an element's corners.
+
+    With fewer than `GRID_MIN_PAIRS` point-element pairs that is every point, else the points
+    of a grid index inside the bounding box of the corners grown by `padding`.
+    """
+    point_count = len(points) // 3
+    if element_count < 2 or point_count * element_count < GRID_MIN_PAIRS:
+        every_point = range(point_count)
+        return lambda corners: every_point
+    index = GridIndex(points)
+    return lambda corners: sorted(index.query_points(corners, padding))
+
+
+def points_on_segments(
+        points: Sequence[float], starts: Sequence[float], ends: Sequence[float], tolerance: float
+) -> list[tuple[int, int]]:
+    """Returns (point, segment) index pairs of points lying on segments.
+
+    All arguments are flat (x, y, z, ...) coordinates. A point is on a segment when its
+    projection falls between the ends and its perpendicular distance is within `tolerance`.
+    Pairs are ordered by segment, then by point.
+    """
+    pairs = []
+    segment_count = len(starts) // 3
+    # a point on a segment is within `tolerance` along it and across it, so up to twice that from its box
+    candidates = point_candidates(points, segment_count, 2 * tolerance)
+    squared_tolerance = tolerance * tolerance
+    for segment in range(segment_count):
+        start, end = _xyz(starts, segment), _xyz(ends, segment)
+        sx, sy, sz = start
+        dx, dy, dz = end[0] - sx, end[1] - sy, end[2] - sz
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        for index in candidates((start, end)):
+            ox, oy, oz = points[index * 3] - sx, points[index * 3 + 1] - sy, points[index * 3 + 2] - sz
+            if length == 0:
+                if math.dist(_xyz(points, index), start) <= tolerance:
+                    pairs.append((index, segment))
+                continue
+            along = (ox * dx + oy * dy + oz * dz) / length
+            if along < -tolerance or along > length + tolerance:
+                continue
+            if ox * ox + oy * oy + oz * oz - along * along <= squared_tolerance:
+                pairs.append((index, segment))
+    return pairs
+
+
+class Triangle:
+    """A triangle with its plane and barycentric terms computed once."""
+
+    def __init__(self, a: Sequence[float], b: Sequence[float], c: Sequence[float]):
+        self.a, self.b, self.c = a, b, c
+        self.e0 = _sub(b, a)
+        self.e1 = _sub(c, a)
+        normal = _cross(self.e0, self.e1)
+        length = math.sqrt(_dot(normal, normal))
+        self.area = length / 2
+        self.normal = (normal[0] / length, normal[1] / length, normal[2] / length) if length else (0.0, 0.0, 0.0)
+        self.d00 = _dot(self.e0, self.e0)
+        self.d01 = _dot(self.e0, self.e1)
+        self.d11 = _dot(self.e1, self.e1)
+        self.denominator = self.d00 * self.d11 - self.d01 * self.d01
+
+    def contains(self, point: Sequence[float], tolerance: float) -> bool:
+        offset = _sub(point, self.a)
+        if abs(_dot(offset, self.normal)) > tolerance:
+            return False
+        d20 = _dot(offset, self.e0)
+        d21 = _dot(offset, self.e1)
+        v = (self.d11 * d20 - self.d01 * d21) / self.denominator
+        w = (self.d00 * d21 - self.d01 * d20) / self.denominator
+        if v >= 0 and w >= 0 and v + w <= 1:
+            return True
+        # outside in the plane, still on the face when close enough to one of its edges
+        return min(
+            segment_distance(point, self.a, self.b),
+            segment_distance(point, self.b, self.c),
+            segment_distance(point, self.c, self.a),
+        ) <= tolerance
+
+
+def quad_coordinates(corners: Sequence[Sequence[float]]) -> list[float]:
+    """Flat coordinates of a quad, the last corner of a triangle (3 corners) is repeated."""
+    return list(chain.from_iterable((list(corners) + list(corners[-1:]) * 4)[:4]))
+
+
+def prepare_quads(quads: Sequence[float]) -> list[list[Triangle]]:
+    """Splits flat quads (4 corners, 12 values each) into triangles along the 1-3 diagonal.
+
+    Degenerate triangles, e.g. the second half of a 3DFACE with repeated corners, are dropped.
+    Triangles go through `quad_coordinates` first.
+    """
+    if len(quads) % 12:
+        raise ValueError(f"quads take 12 values each, got {len(quads)}")
+    prepared = []
+    for quad in range(len(quads) // 12):
+        corners = [_xyz(quads, quad * 4 + corner) for corner in range(4)]
+        triangles = [Triangle(corners[0], corners[1], corners[3]), Triangle(corners[1], corners[2], corners[3])]
+        prepared.append([triangle for triangle in triangles if triangle.area > 0])
+    return prepared
+
+
+def points_in_quads(
+        points: Sequence[float], quads: Sequence[float] | list[list[Triangle]], tolerance: float
+) -> list[tuple[int, int]]:
+    """Returns (point, quad) index pairs of points lying on quads within `tolerance` of their plane.
+
+    `quads` are flat corner coordinates or the result of `prepare_quads`. Pairs are ordered by
+    quad, then by point.
+    """
+    if quads and not isinstance(quads[0], list):
+        quads = prepare_quads(quads)
+    pairs = []
+    # a point on a triangle is within `tolerance` of it on every axis
+    candidates = point_candidates(points, len(quads), tolerance)
+    for quad, triangles in enumerate(quads):
+        if not triangles:
+            continue
+        corners = [corner for triangle in triangles for corner in (triangle.a, triangle.b, triangle.c)]
+        for index in candidates(corners):
+            point = _xyz(points, index)
+            if any(triangle.contains(point, tolerance) for triangle in triangles):
+                pairs.append((index, quad))
+    return pairs
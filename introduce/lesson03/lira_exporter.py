@@ -1,17 +1,19 @@
+from array import array
+from collections import Counter, defaultdict
 from dataclasses import dataclass, field
 from functools import cached_property
+from itertools import chain
+from typing import Iterable, Iterator
 
-from introduce.lesson02.dxf_parser import DXFParser
-from introduce.lesson02.entities import Point, Line, E3DFace, Layer
-from introduce.lesson03.consts import TEMPLATE
-from introduce.lesson03.dof_calc import get_dof_points_from_lines_by_dof_lines, get_dof_points_from_with_dof_3d_faces, \
-    get_dof_points_from_lines_with_dof_3d_faces, get_dof_points_from_faces_by_dof_lines
-
-START = "(0/1;csv2lira/2;5/39; 1:'dead load';)(1/\n"
-END = """)(6/1 16 3 1 1/)
-(7/1 0.0 0.0 0.0 0.0 /)
-(8/0 0 0 0 0 0 0/)
-"""
+from introduce.lesson02.entities import DXFEntity, Point, Line, E3DFace, Layer, Polyline
+from introduce.lesson02.instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from introduce.lesson03.dof_calc import get_dof_points_by_dof_lines, get_dof_points_by_dof_3d_faces
+from introduce.lesson03.node_merge import NodeMerger
+from introduce.lesson03.incremental import IncrementalExporter, IncrementalStats
+from introduce.lesson03.lira_writer import LiraWriter, format_bars, format_nodes, format_face, dof_code
+from introduce.lesson03.renumbering import BandwidthReport, choose_numbering, measure
+from introduce.lesson03.spatial_index import GridIndex
+from introduce.lesson03.topology import DuplicateReport, find_duplicates, find_overlaps, split_points
 
 
 @dataclass
@@ -21,6 +23,16 @@ class LiraExporter:
     e3d_faces: list[E3DFace]
     dof_lines: list[Line] = field(default_factory=list)
     dof_3dfaces: list[E3DFace] = field(default_factory=list)
+    # exported as bars, one per segment
+    polylines: list[Polyline] = field(default_factory=list)
+    # renumber nodes with reverse Cuthill-McKee to keep the stiffness matrix bandwidth small
+    renumber: bool = False
+    # stage timers and counters, see `introduce.lesson02.instrumentation`
+    instrumentation: Instrumentation = field(default=NULL_INSTRUMENTATION, repr=False, compare=False)
+
+    CACHED_PROPERTIES = (
+        "all_points", "nodes", "unique_points", "line_nodes", "polyline_nodes", "face_nodes", "layers"
+    )
 
     @cached_property
     def all_points(self) -> list[Point]:
@@ -31,176 +43,382 @@ class LiraExporter:
             points.append(line.end)
         for i, e3d_face in enumerate(self.e3d_faces):
             points.extend(e3d_face.points)
+        for polyline in self.polylines:
+            points.extend(polyline.points)
 
         return self.points + points
 
+    def vertex_coordinates(self) -> Iterator[float]:
+        """Flat coordinates of `all_points` without building the points."""
+        return chain(
+            chain.from_iterable(point.to_tuple() for point in self.points),
+            chain.from_iterable(line.start.to_tuple() + line.end.to_tuple() for line in self.lines),
+            chain.from_iterable(point.to_tuple() for face in self.e3d_faces for point in face.points),
+            chain.from_iterable(polyline.coordinates for polyline in self.polylines),
+        )
+
+    @cached_property
+    def nodes(self) -> tuple[NodeMerger, array, array]:
+        """Merged nodes of `all_points`, the node number of every point in it and of every merged node.
+
+        Nodes are numbered in the order they are first seen, with `renumber` by reverse Cuthill-McKee
+        when that improves the bandwidth or profile, see `choose_numbering`.
+        """
+        with self.instrumentation.stage("nodes"):
+            node_merger = NodeMerger()
+            inverse = node_merger.add_all(self.vertex_coordinates())
+            numbers = array("i", [index + 1 for index in inverse])
+            self.instrumentation.count("points", len(numbers))
+            self.instrumentation.count("nodes_merged", len(numbers) - len(node_merger))
+            if not self.renumber:
+                return node_merger, numbers, array("i", range(1, len(node_merger) + 1))
+            with self.instrumentation.stage("renumber"):
+                line_nodes, polyline_nodes, face_nodes = self.split_elements(numbers)
+                numbering = choose_numbering(
+                    len(node_merger), chain(line_nodes, chain.from_iterable(polyline_nodes), face_nodes)
+                )
+                return node_merger, array("i", [numbering[number - 1] for number in numbers]), numbering
+
+    @property
+    def node_numbers(self) -> array:
+        return self.nodes[1]
+
     @cached_property
     def unique_points(self) -> dict[Point, int]:
-        points = self.all_points
-        unique_points = set(points)
+        with self.instrumentation.stage("unique_points"):
+            first_points = {}
+            for point, number in zip(self.all_points, self.node_numbers):
+                first_points.setdefault(number, point)
+            return {point: number for number, point in sorted(first_points.items())}
+
+    def split_elements(
+            self, numbers: array
+    ) -> tuple[list[tuple[int, int]], list[list[tuple[int, int]]], list[tuple[int, ...]]]:
+        """Node numbers of every line, polyline segment and face, `numbers` are laid out like `all_points`.
+
+        Segments of a polyline are numbered like `Polyline.segments()`.
+        """
+        offset = len(self.points)
+        line_nodes = [(numbers[offset + i * 2], numbers[offset + i * 2 + 1]) for i in range(len(self.lines))]
+        offset += len(self.lines) * 2
+        face_nodes = []
+        for face in self.e3d_faces:
+            count = len(face.points)
+            face_nodes.append(tuple(numbers[offset:offset + count]))
+            offset += count
+        polyline_nodes = []
+        for polyline in self.polylines:
+            polyline_nodes.append([
+                (numbers[offset + start], numbers[offset + end]) for start, end in polyline.segments()
+            ])
+            offset += polyline.vertex_count
+        return line_nodes, polyline_nodes, face_nodes
+
+    @cached_property
+    def line_nodes(self) -> list[tuple[int, int]]:
+        return self.split_elements(self.node_numbers)[0]
+
+    @cached_property
+    def polyline_nodes(self) -> list[list[tuple[int, int]]]:
+        return self.split_elements(self.node_numbers)[1]
+
+    @cached_property
+    def face_nodes(self) -> list[tuple[int, ...]]:
+        return self.split_elements(self.node_numbers)[2]
 
-        res = {}
-        for i, point in enumerate(unique_points):
-            res[point] = i + 1
-        return res
+    def bandwidth_report(self) -> BandwidthReport:
+        """Bandwidth and profile of the elements in first seen node order and in the current one."""
+        _, numbers, numbering = self.nodes
+        first_seen = array("i", bytes(4 * (len(numbering) + 1)))
+        for index, number in enumerate(numbering):
+            first_seen[number] = index + 1
+        after = self.line_nodes + list(chain.from_iterable(self.polyline_nodes)) + self.face_nodes
+        before = [tuple(first_seen[number] for number in element) for element in after]
+        return measure(len(numbering), before, after)
 
     def get_index(self, point: Point):
-        return self.unique_points[point]
+        node_merger, _, numbering = self.nodes
+        return numbering[node_merger.find(point.x, point.y, point.z)]
+
+    def clear_cache(self):
+        for name in self.CACHED_PROPERTIES:
+            self.__dict__.pop(name, None)
+
+    @classmethod
+    def from_entities(cls, entities: Iterable[tuple[str, DXFEntity]], **kwargs) -> "LiraExporter":
+        """Builds an exporter from `DXFParser.iter_entities` the way `filter_by_layer_template` would.
+
+        Entities are sorted into their lists as they arrive and the ones on layers matching no
+        template are dropped right away, so the unfiltered drawing is never held in memory.
+        """
+        lira = cls(points=[], lines=[], e3d_faces=[], **kwargs)
+        # DOF lines of polylines go after the DOF lines of lines, as in `filter_by_layer_template`
+        polyline_dof_lines = []
+        counts = Counter()
+        with lira.instrumentation.stage("filter"):
+            for entity_type, entity in entities:
+                counts[entity_type] += 1
+                layer = entity.layer
+                if entity_type == "POINT":
+                    if layer.is_valid():
+                        lira.points.append(entity)
+                elif entity_type == "LINE":
+                    if layer.is_dof_valid():
+                        lira.dof_lines.append(entity)
+                    if layer.is_valid():
+                        lira.lines.append(entity)
+                elif entity_type == "3DFACE":
+                    if layer.is_dof_valid():
+                        lira.dof_3dfaces.append(entity)
+                    if layer.is_valid():
+                        lira.e3d_faces.append(entity)
+                elif entity_type == "POLYLINE":
+                    if layer.is_dof_valid():
+                        polyline_dof_lines.extend(entity.to_lines())
+                    if layer.is_valid():
+                        lira.polylines.append(entity)
+            lira.dof_lines += polyline_dof_lines
+        for entity_type, count in counts.items():
+            lira.instrumentation.count(f"entities.{entity_type}", count)
+        return lira
 
     def filter_by_layer_template(self):
-        self.points = [p for p in self.points if p.layer.is_valid()]
-        self.dof_lines = [l for l in self.lines if l.layer.is_dof_valid()]
-        self.lines = [l for l in self.lines if l.layer.is_valid()]
-        self.dof_3dfaces = [f for f in self.e3d_faces if f.layer.is_dof_valid()]
-        self.e3d_faces = [f for f in self.e3d_faces if f.layer.is_valid()]
-        self.__dict__.pop("all_points", None)  # clear cache
-        self.__dict__.pop("unique_points", None)  # clear cache
-        self.__dict__.pop("layers", None)  # clear cache
+        with self.instrumentation.stage("filter"):
+            self.points = [p for p in self.points if p.layer.is_valid()]
+            self.dof_lines = [l for l in self.lines if l.layer.is_dof_valid()]
+            self.lines = [l for l in self.lines if l.layer.is_valid()]
+            self.dof_3dfaces = [f for f in self.e3d_faces if f.layer.is_dof_valid()]
+            self.e3d_faces = [f for f in self.e3d_faces if f.layer.is_valid()]
+            self.dof_lines += [l for p in self.polylines if p.layer.is_dof_valid() for l in p.to_lines()]
+            self.polylines = [p for p in self.polylines if p.layer.is_valid()]
+            self.clear_cache()
 
     @cached_property
     def layers(self):
-        layers = list({p.layer for p in self.unique_points.keys()})
-        return {l: i + 1 for i, l in enumerate(layers)}
-
-    def convert_3d_face(self, face: E3DFace):
-        face_type = 42 if face.is_triangle() else 44
-        if face_type == 42:
-            exported_points = [str(self.get_index(p)) for p in set(face.points)]
-        else:
-            exported_points = [
-                str(self.get_index(p)) for p in [face.points[0], face.points[1], face.points[3], face.points[2]]
-            ]
-        return "{face_type} {layer} {points}/\n".format(
-            face_type=face_type,
-            layer=self.get_layer_index(face.layer),
-            points=" ".join(exported_points),
-        )
+        with self.instrumentation.stage("layers"):
+            layers = dict.fromkeys(chain(
+                (point.layer for point in self.points),
+                (line.layer for line in self.lines),
+                (face.layer for face in self.e3d_faces),
+                (polyline.layer for polyline in self.polylines),
+            ))
+            return {l: i + 1 for i, l in enumerate(layers)}
+
+    def convert_3d_face(self, face: E3DFace, nodes: tuple[int, ...]):
+        return format_face(self.get_layer_index(face.layer), nodes)
 
     def get_layer_index(self, layer: Layer):
         return self.layers[layer]
 
+    def line_rows(self) -> Iterator[str]:
+        layers = self.layers
+        return format_bars((layers[line.layer] for line in self.lines), self.line_nodes)
+
+    def polyline_rows(self) -> Iterator[str]:
+        layers = self.layers
+        for polyline, segments in zip(self.polylines, self.polyline_nodes):
+            # segments whose ends merged into one node are left out
+            segments = [(start, end) for start, end in segments if start != end]
+            yield from format_bars([layers[polyline.layer]] * len(segments), segments)
+
+    def e3d_face_rows(self) -> Iterator[str]:
+        layers = self.layers
+        for face, nodes in zip(self.e3d_faces, self.face_nodes):
+            yield "44 {layer} {points}/\n".format(layer=layers[face.layer], points=" ".join(map(str, nodes)))
+
+    def layer_rows(self) -> Iterator[str]:
+        return (layer.to_lira_format(i) for layer, i in self.layers.items())
+
+    def node_coordinates(self) -> array:
+        """Flat coordinates of the nodes in node number order."""
+        node_merger, _, numbering = self.nodes
+        if not self.renumber:
+            return node_merger.coordinates
+        merged = node_merger.coordinates
+        coordinates = array("d", bytes(8 * len(merged)))
+        for index, number in enumerate(numbering):
+            coordinates[(number - 1) * 3:number * 3] = merged[index * 3:index * 3 + 3]
+        return coordinates
+
+    def node_rows(self) -> Iterator[str]:
+        return format_nodes(self.node_coordinates())
+
     def get_converted_lines(self):
-        results = ""
-        for line in self.lines:
-            results += "5 {layer} {start} {end}/\n".format(
-                start=self.get_index(line.start),
-                end=self.get_index(line.end),
-                layer=self.get_layer_index(line.layer)
-            )
-        return results
+        return "".join(self.line_rows())
 
     def get_converted_e3d_faces(self):
-        results = ""
-        for face in self.e3d_faces:
-            points = [str(self.get_index(p)) for p in face.points]
-            results += "44 {layer} {points}/\n".format(
-                layer=self.get_layer_index(face.layer),
-                points=" ".join(points),
-            )
-        return results
+        return "".join(self.e3d_face_rows())
 
     def export(self, filename) -> None:
-        with open(filename, "w") as file:
-            unique_points = ""
-            drawing_objects = self.get_converted_lines()
-            drawing_objects += "\n" + self.get_converted_e3d_faces()
-            layers = ""
-            for layer, i in self.layers.items():
-                layers += layer.to_lira_format(i)
-            for point in self.unique_points.keys():
-                unique_points += f"{point.x} {point.y} {point.z}/\n"
-            file.write(TEMPLATE.format(unique_points=unique_points, drawing_objects=drawing_objects, layers=layers))
+        with self.instrumentation.stage("export"), LiraWriter(filename) as writer:
+            writer.write_section(1, chain(self.line_rows(), self.polyline_rows(), ["\n"], self.e3d_face_rows()))
+            writer.write_section(3, self.layer_rows())
+            writer.write_section(4, self.node_rows())
+        self.instrumentation.count("chars_written", writer.chars_written)
+
+    def split_bars(self) -> int:
+        """Splits lines and polyline segments at the nodes lying on them and where they cross other bars.
+
+        Bars crossing a DOF line are split too, so `calculate_dof_points` finds a node there. Lines
+        are replaced by their pieces, polylines get the split points as extra vertices. Returns
+        the number of bars added.
+        """
+        with self.instrumentation.stage("split_bars"):
+            coordinates = array("d", self.node_coordinates())
+            bars = []
+            # (list name, entity index, segment index) of every bar
+            owners = []
+            for i, nodes in enumerate(self.line_nodes):
+                bars.append(nodes)
+                owners.append(("lines", i, 0))
+            for i, segments in enumerate(self.polyline_nodes):
+                for segment, nodes in enumerate(segments):
+                    if nodes[0] != nodes[1]:
+                        bars.append(nodes)
+                        owners.append(("polylines", i, segment))
+            # DOF lines only cut, their ends are added after the nodes
+            for i, line in enumerate(self.dof_lines):
+                coordinates.extend(line.start.to_tuple() + line.end.to_tuple())
+                bars.append((len(coordinates) // 3 - 1, len(coordinates) // 3))
+                owners.append(("dof_lines", i, 0))
+            splits = defaultdict(dict)
+            for position, points in split_points(coordinates, bars, Point.accuracy).items():
+                name, index, segment = owners[position]
+                if name != "dof_lines":
+                    splits[name, index][segment] = points
+            if not splits:
+                return 0
+
+            lines = []
+            for i, line in enumerate(self.lines):
+                points = splits.get(("lines", i), {}).get(0)
+                if points is None:
+                    lines.append(line)
+                    continue
+                layer = line.layer
+                vertices = [line.start, *(Point(*point, layer=layer) for point in points), line.end]
+                lines.extend(
+                    Line(start, end, layer=layer, handle=getattr(line, "handle", None))
+                    for start, end in zip(vertices, vertices[1:])
+                )
+            polylines = []
+            for i, polyline in enumerate(self.polylines):
+                segment_points = splits.get(("polylines", i))
+                if segment_points is None:
+                    polylines.append(polyline)
+                    continue
+                coordinates = array("d")
+                for segment, (start, _) in enumerate(polyline.segments()):
+                    coordinates.extend(polyline.coordinates[start * 3:start * 3 + 3])
+                    coordinates.extend(chain.from_iterable(segment_points.get(segment, ())))
+                if not polyline.closed or polyline.vertex_count < 3:
+                    coordinates.extend(polyline.coordinates[-3:])
+                polylines.append(Polyline(coordinates, polyline.layer, polyline.closed, polyline.handle))
+
+            added = sum(len(points) for segment_points in splits.values() for points in segment_points.values())
+            self.lines = lines
+            self.polylines = polylines
+            self.clear_cache()
+            return added
+
+    def remove_duplicate_elements(self) -> DuplicateReport:
+        """Drops lines, polyline segments and faces repeating the nodes, type and layer of an earlier one.
+
+        Elements are compared by merged node numbers, so reversed copies and copies within the
+        accuracy are found too. Collinear overlapping bars are only counted in the report.
+        """
+        with self.instrumentation.stage("remove_duplicates"):
+            layers = self.layers
+            elements = []
+            # (list name, entity index, segment index, layer) of every element
+            owners = []
+            for i, (line, nodes) in enumerate(zip(self.lines, self.line_nodes)):
+                elements.append((5, layers[line.layer], nodes))
+                owners.append(("lines", i, 0, line.layer))
+            for i, (polyline, segments) in enumerate(zip(self.polylines, self.polyline_nodes)):
+                for segment, nodes in enumerate(segments):
+                    if nodes[0] != nodes[1]:
+                        elements.append((5, layers[polyline.layer], nodes))
+                        owners.append(("polylines", i, segment, polyline.layer))
+            for i, (face, nodes) in enumerate(zip(self.e3d_faces, self.face_nodes)):
+                elements.append((44, layers[face.layer], nodes))
+                owners.append(("e3d_faces", i, 0, face.layer))
+
+            report = DuplicateReport()
+            dropped = defaultdict(set)
+            duplicates = set(find_duplicates(elements))
+            for position in duplicates:
+                name, index, segment, layer = owners[position]
+                report.duplicates[layer.name] += 1
+                dropped[name, index].add(segment)
+
+            bars = [
+                (nodes, owners[position][3]) for position, (element_type, _, nodes) in enumerate(elements)
+                if element_type == 5 and nodes[0] != nodes[1] and position not in duplicates
+            ]
+            overlaps = find_overlaps(GridIndex(self.node_coordinates()), [nodes for nodes, _ in bars], Point.accuracy)
+            for first, second in overlaps:
+                for layer in {bars[first][1], bars[second][1]}:
+                    report.overlaps[layer.name] += 1
+
+            if duplicates:
+                self.lines = [line for i, line in enumerate(self.lines) if ("lines", i) not in dropped]
+                self.e3d_faces = [face for i, face in enumerate(self.e3d_faces) if ("e3d_faces", i) not in dropped]
+                self.polylines = list(chain.from_iterable(
+                    polyline.without_segments(dropped.get(("polylines", i), set()))
+                    for i, polyline in enumerate(self.polylines)
+                ))
+                self.clear_cache()
+            return report
 
     def calculate_dof_points(self):
-        self.points += get_dof_points_from_lines_by_dof_lines(self.lines, self.dof_lines)
-        self.points += get_dof_points_from_faces_by_dof_lines(self.e3d_faces, self.dof_lines)
-        self.points += get_dof_points_from_with_dof_3d_faces(self.e3d_faces, self.dof_3dfaces)
-        self.points += get_dof_points_from_lines_with_dof_3d_faces(self.lines, self.dof_3dfaces)
-
-    def _write_dof(self, file):
-        file.write(")(5/\n")
-        for point in self.points:
-            dof = point.layer.unique_name.replace("fx", "4")
-            dof = dof.replace("fy", "5")
-            dof = dof.replace("fz", "6")
-            dof = dof.replace("x", "1")
-            dof = dof.replace("y", "2")
-            dof = dof.replace("z", "3")
-
-            file.write(f"{self.get_index(point)} {dof}/\n")
+        with self.instrumentation.stage("dof"):
+            node_merger, numbers, numbering = self.nodes
+            merged = array("i", bytes(4 * (len(numbering) + 1)))
+            for index, number in enumerate(numbering):
+                merged[number] = index
+            # only nodes of elements get supports, not the ones of POINT entities alone,
+            # they are matched in first seen order whatever the numbering
+            indices = sorted({merged[number] for number in numbers[len(self.points):]})
+            coordinates = node_merger.coordinates
+            nodes = GridIndex(array("d", chain.from_iterable(
+                coordinates[index * 3:index * 3 + 3] for index in indices
+            )))
+            self.points += get_dof_points_by_dof_lines(nodes, self.dof_lines, self.instrumentation)
+            self.points += get_dof_points_by_dof_3d_faces(nodes, self.dof_3dfaces, self.instrumentation)
+            self.clear_cache()
+
+    def dof_rows(self) -> Iterator[str]:
+        dofs = {}
+        for point, number in zip(self.points, self.node_numbers):
+            dof = dofs.get(point.layer)
+            if dof is None:
+                dof = dofs[point.layer] = dof_code(point.layer.unique_name)
+            yield f"{number} {dof}/\n"
+
+    def export_incremental(self, filename, state_path) -> IncrementalStats:
+        """Like `export_partial` after `calculate_dof_points`, reusing the state of the previous run."""
+        with self.instrumentation.stage("export"):
+            return IncrementalExporter(state_path).export(self, filename)
 
     def export_partial(self, filename):
         """(0/1;csv2lira/2;5/39; 1:'dead load';)(1/
         {drawing_objects}
         )(3/
         {layers}
-        (4/
+        )(4/
         {unique_points}
+        )(5/
+        {dof_points}
         )(6/1 16 3 1 1/)
         (7/1 0.0 0.0 0.0 0.0 /)
         (8/0 0 0 0 0 0 0/)
         """
-        with open(filename, "w") as file:
-            file.write(START)
-            for line in self.lines:
-                file.write("5 {layer} {start} {end}/\n".format(
-                    start=self.get_index(line.start),
-                    end=self.get_index(line.end),
-                    layer=self.get_layer_index(line.layer)
-                ))
-            for face in self.e3d_faces:
-                file.write(self.convert_3d_face(face))
-            file.write(")(3/\n")
-            for layer, i in self.layers.items():
-                file.write(layer.to_lira_format(i))
-            file.write(")(4/\n")
-            for point in self.unique_points.keys():
-                file.write(f"{point.x} {point.y} {point.z}/\n")
-            self._write_dof(file)
-            file.write(END)
-
-
-if __name__ == "__main__":
-    print("Parsing DXF")
-    from datetime import datetime
-
-    print(datetime.now())
-    parser = DXFParser("data1/LinesCrossRoadsWith3Dfaces.dxf")
-    # parser = DXFParser("data/DZ_6-exp4.dxf")
-    # parser = DXFParser("../lesson02/data/hw.dxf")
-    entities = parser.parse()
-    print(datetime.now())
-    print("Lira exporting")
-    lira = LiraExporter(
-        points=entities["POINT"],
-        lines=entities["LINE"],
-        e3d_faces=entities["3DFACE"]
-    )
-    # lira.export("data/layer-out-cache.txt")
-    print(datetime.now())
-    print("Filtering")
-    lira.filter_by_layer_template()
-    print(datetime.now())
-    print("Calculating")
-    lira.calculate_dof_points()
-    print(datetime.now())
-    print("writing output")
-    lira.export_partial("data1/LinesCrossRoadsWith3Dfaces.txt")
-    print(datetime.now())
-    print("Done")
-    # print(len(lira.all_points))
-    # print(len(lira.unique_points))
-    # print("\n================================")
-    # lira.filter_by_layer_template()
-    # print(len(lira.all_points))
-    # print(len(lira.unique_points))
-    # lira.export("data/layer-out.txt")
-    # # for i, k in enumerate(lira.unique_points.keys()):
-    # #     print(i, k)
-    # #     assert k == i + 1
-    # # for k, v in lira.unique_points.items():
-    # #     print(v)
-    # for k, v in entities.items():
-    #     print(f"Entities of type {k}:")
-    #     for entity in v:
-    #         print("    ", entity.to_tuple())
+        with self.instrumentation.stage("export"), LiraWriter(filename) as writer:
+            face_rows = (self.convert_3d_face(face, nodes) for face, nodes in zip(self.e3d_faces, self.face_nodes))
+            writer.write_section(1, chain(self.line_rows(), self.polyline_rows(), face_rows))
+            writer.write_section(3, self.layer_rows())
+            writer.write_section(4, self.node_rows())
+            writer.write_section(5, self.dof_rows())
+        self.instrumentation.count("chars_written", writer.chars_written)
+
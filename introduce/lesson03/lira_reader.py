@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import gzip
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, TextIO
+
+SECTION_PATTERN = re.compile(r"\((\d+)/")
+
+DOF_CODES = "123456"
+
+
+@dataclass
+class LiraModel:
+    """Compact tables of a LIRA document.
+
+    Element `i` has type `element_types[i]`, layer `element_layers[i]` and the node numbers
+    `element_nodes[element_offsets[i]:element_offsets[i + 1]]`. Node `n` (numbered from 1)
+    has coordinates `nodes[(n - 1) * 3:n * 3]`. DOFs are stored as bit masks, bit 0 is DOF 1.
+    """
+    nodes: array = field(default_factory=lambda: array("d"))
+    element_types: array = field(default_factory=lambda: array("H"))
+    element_layers: array = field(default_factory=lambda: array("H"))
+    element_offsets: array = field(default_factory=lambda: array("i", [0]))
+    element_nodes: array = field(default_factory=lambda: array("i"))
+    layers: dict[int, str] = field(default_factory=dict)
+    dof_nodes: array = field(default_factory=lambda: array("i"))
+    dof_masks: array = field(default_factory=lambda: array("B"))
+    # sections without a table, kept as raw text
+    other_sections: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes) // 3
+
+    @property
+    def element_count(self) -> int:
+        return len(self.element_types)
+
+    def element(self, index: int) -> tuple[int, int, tuple[int, ...]]:
+        start, end = self.element_offsets[index], self.element_offsets[index + 1]
+        return self.element_types[index], self.element_layers[index], tuple(self.element_nodes[start:end])
+
+    def dofs(self) -> dict[int, str]:
+        """Maps node number to its DOF codes, e.g. "1 2 3"."""
+        masks = {}
+        for node, mask in zip(self.dof_nodes, self.dof_masks):
+            masks[node] = masks.get(node, 0) | mask
+        return {
+            node: " ".join(code for bit, code in enumerate(DOF_CODES) if mask & (1 << bit))
+            for node, mask in masks.items()
+        }
+
+    def differences(self, other: LiraModel, tolerance: float = 0.0) -> list[str]:
+        """Describes what differs from `other`, an empty list means the models match."""
+        differences = []
+        if self.node_count != other.node_count:
+            differences.append(f"nodes: {self.node_count} != {other.node_count}")
+        else:
+            moved = sum(1 for a, b in zip(self.nodes, other.nodes) if abs(a - b) > tolerance)
+            if moved:
+                differences.append(f"nodes: {moved} coordinates differ")
+        if self.element_count != other.element_count:
+            differences.append(f"elements: {self.element_count} != {other.element_count}")
+        elif (self.element_types, self.element_layers, self.element_nodes) != (
+                other.element_types, other.element_layers, other.element_nodes
+        ):
+            changed = sum(1 for i in range(self.element_count) if self.element(i) != other.element(i))
+            differences.append(f"elements: {changed} differ")
+        if self.layers != other.layers:
+            differences.append("layers differ")
+        if self.dofs() != other.dofs():
+            differences.append("dofs differ")
+        return differences
+
+
+class LiraReader:
+    """Reads LIRA documents written by `LiraExporter`/`LiraWriter`.
+
+    The document is read section by section, rows of a section are parsed in one batch.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def open(self) -> TextIO:
+        if self.filename.endswith(".gz"):
+            return gzip.open(self.filename, "rt", encoding="utf-8")
+        return open(self.filename, "r", encoding="utf-8")
+
+    def iter_sections(self, file: TextIO) -> Iterable[tuple[int, list[str]]]:
+        section = None
+        rows: list[str] = []
+        for line in file:
+            stripped = line.strip()
+            if stripped.startswith("(") or stripped.startswith(")("):
+                headers = list(SECTION_PATTERN.finditer(stripped))
+                if headers:
+                    if section is not None:
+                        yield section, rows
+                    section = int(headers[-1].group(1))
+                    rest = stripped[headers[-1].end():]
+                    rows = [rest] if rest else []
+                    continue
+            if stripped and section is not None:
+                rows.append(stripped)
+        if section is not None:
+            yield section, rows
+
+    def read(self) -> LiraModel:
+        model = LiraModel()
+        with self.open() as file:
+            for section, rows in self.iter_sections(file):
+                if section == 1:
+                    self._read_elements(model, rows)
+                elif section == 3:
+                    for row in rows:
+                        number, text = row.rstrip("/").split(" ", 1)
+                        model.layers[int(number)] = text
+                elif section == 4:
+                    model.nodes.extend(map(float, " ".join(rows).replace("/", " ").split()))
+                elif section == 5:
+                    self._read_dofs(model, rows)
+                else:
+                    model.other_sections[section] = "\n".join(rows)
+        return model
+
+    @staticmethod
+    def _read_elements(model: LiraModel, rows: list[str]) -> None:
+        offset = model.element_offsets[-1]
+        for row in rows:
+            values = row.rstrip("/").split()
+            model.element_types.append(int(values[0]))
+            model.element_layers.append(int(values[1]))
+            model.element_nodes.extend(map(int, values[2:]))
+            offset += len(values) - 2
+            model.element_offsets.append(offset)
+
+    @staticmethod
+    def _read_dofs(model: LiraModel, rows: list[str]) -> None:
+        for row in rows:
+            values = row.rstrip("/").split()
+            mask = 0
+            for code in values[1:]:
+                mask |= 1 << DOF_CODES.index(code)
+            model.dof_nodes.append(int(values[0]))
+            model.dof_masks.append(mask)
@@ -0,0 +1,92 @@
+import gzip
+import io
+from itertools import islice
+from typing import Iterable
+
+START = "(0/1;csv2lira/2;5/39; 1:'dead load';)(1/\n"
+END = """)(6/1 16 3 1 1/)
+(7/1 0.0 0.0 0.0 0.0 /)
+(8/0 0 0 0 0 0 0/)
+"""
+
+
+class LiraWriter:
+    """Streams a LIRA document section by section through a large write buffer.
+
+    Sections must be written in order starting with (1/, rows are joined in batches before
+    they reach the buffer. A filename ending with `.gz` is written gzip compressed.
+    """
+    BUFFER_SIZE = 1 << 20
+    BATCH_SIZE = 4096
+
+    def __init__(self, filename: str, compress: bool | None = None):
+        self.filename = filename
+        self.compress = filename.endswith(".gz") if compress is None else compress
+        self.file: io.TextIOBase | None = None
+        self.section: int | None = None
+        self.chars_written = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(finish=exc_type is None)
+
+    def open(self):
+        if self.compress:
+            raw = gzip.GzipFile(self.filename, "wb")
+            self.file = io.TextIOWrapper(io.BufferedWriter(raw, self.BUFFER_SIZE), encoding="utf-8")
+        else:
+            self.file = open(self.filename, "w", buffering=self.BUFFER_SIZE, encoding="utf-8")
+
+    def close(self, finish: bool = True):
+        if self.file is None:
+            return
+        if finish:
+            self._write(START if self.section is None else "")
+            self._write(END)
+        self.file.close()
+        self.file = None
+
+    def write_section(self, number: int, rows: Iterable[str]) -> None:
+        if self.section is None:
+            self._write(START)
+        if self.section is not None or number != 1:
+            self._write(f")({number}/\n")
+        self.section = number
+        rows = iter(rows)
+        while batch := list(islice(rows, self.BATCH_SIZE)):
+            self._write("".join(batch))
+
+    def _write(self, text: str) -> None:
+        self.chars_written += len(text)
+        self.file.write(text)
+
+
+def format_bars(layers: Iterable[int], nodes: Iterable[tuple[int, int]]) -> Iterable[str]:
+    return (f"5 {layer} {start} {end}/\n" for layer, (start, end) in zip(layers, nodes))
+
+
+def format_nodes(coordinates: Iterable[float]) -> Iterable[str]:
+    values = iter(coordinates)
+    return (f"{x} {y} {z}/\n" for x, y, z in zip(values, values, values))
+
+
+def format_face(layer: int, nodes: tuple[int, ...]) -> str:
+    """A 3DFACE row, a face with a repeated corner is written as a triangle (42), a quad as 44."""
+    unique_nodes = list(dict.fromkeys(nodes))
+    if len(unique_nodes) == 3:
+        return f"42 {layer} {' '.join(map(str, unique_nodes))}/\n"
+    return f"44 {layer} {' '.join(str(nodes[i]) for i in (0, 1, 3, 2))}/\n"
+
+
+def dof_code(unique_name: str) -> str:
+    """Converts the DOF part of a layer name, e.g. "x y fz", to LIRA codes "1 2 6"."""
+    dof = unique_name.replace("fx", "4")
+    dof = dof.replace("fy", "5")
+    dof = dof.replace("fz", "6")
+    dof = dof.replace("x", "1")
+    dof = dof.replace("y", "2")
+    dof = dof.replace("z", "3")
+    return dof
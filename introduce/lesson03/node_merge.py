@@ -0,0 +1,138 @@
+import math
+from array import array
+from collections import Counter
+from itertools import product
+from typing import Iterable
+
+from introduce.lesson02.dxf_parser import paused_gc
+from introduce.lesson02.entities import Point
+
+NEIGHBOUR_CELLS = tuple(product((-1, 0, 1), repeat=3))
+# one of every pair of opposite neighbours, each pair of neighbouring cells is checked once
+FORWARD_CELLS = tuple(offset for offset in NEIGHBOUR_CELLS if offset > (0, 0, 0))
+
+
+class NodeMerger:
+    """Merges points closer than `accuracy` on every axis into nodes.
+
+    Nodes are bucketed in a uniform grid with the cell size equal to the accuracy, so a
+    matching node can only be in one of the 27 cells around a point. Nodes are indexed
+    from 0 in the order they are first seen, coordinates are kept flat (x, y, z per node).
+    """
+
+    def __init__(self, accuracy: float = Point.accuracy):
+        self.accuracy = accuracy
+        self.coordinates = array("d")
+        self._grid: dict[tuple[int, int, int], list[int]] = {}
+        # exact coordinates seen before, most vertices of a drawing are shared exactly
+        self._exact: dict[tuple[float, float, float], int] = {}
+
+    def __len__(self):
+        return len(self.coordinates) // 3
+
+    def cell(self, x: float, y: float, z: float) -> tuple[int, int, int]:
+        return (
+            math.floor(x / self.accuracy),
+            math.floor(y / self.accuracy),
+            math.floor(z / self.accuracy),
+        )
+
+    def find(self, x: float, y: float, z: float) -> int | None:
+        """Returns the index of the first node matching the coordinates or None."""
+        found = self._exact.get((x, y, z))
+        if found is not None:
+            return found
+        accuracy = self.accuracy
+        coordinates = self.coordinates
+        cx, cy, cz = self.cell(x, y, z)
+        for dx, dy, dz in NEIGHBOUR_CELLS:
+            for index in self._grid.get((cx + dx, cy + dy, cz + dz), ()):
+                if (
+                        (found is None or index < found)
+                        and abs(coordinates[index * 3] - x) <= accuracy
+                        and abs(coordinates[index * 3 + 1] - y) <= accuracy
+                        and abs(coordinates[index * 3 + 2] - z) <= accuracy
+                ):
+                    found = index
+        return found
+
+    def add(self, x: float, y: float, z: float) -> int:
+        """Returns the index of the node the coordinates are merged into, creating it if needed."""
+        index = self.find(x, y, z)
+        if index is None:
+            index = len(self)
+            self.coordinates.extend((x, y, z))
+            self._grid.setdefault(self.cell(x, y, z), []).append(index)
+        self._exact[(x, y, z)] = index
+        return index
+
+    def add_all(self, coordinates: Iterable[float]) -> array:
+        """Merges flat (x, y, z, ...) coordinates, returns the node index of every vertex.
+
+        An empty merger takes them in one batch, see `_add_batch`, which numbers the nodes the
+        same as adding the vertices one by one.
+        """
+        if not len(self):
+            with paused_gc():
+                return self._add_batch(array("d", coordinates))
+        add = self.add
+        values = iter(coordinates)
+        return array("i", [add(x, y, z) for x, y, z in zip(values, values, values)])
+
+    def _add_batch(self, values: array) -> array:
+        """Exact duplicates are dropped first and the unique points are quantized to cells.
+        Only points sharing their cell or a neighbouring one with another point can merge. The
+        occupied cells are numbered as ints, so every neighbour offset is checked for all cells
+        with one set intersection. Only the points of such contested cells go through `find`,
+        every other point is a node of its own.
+        """
+        points = list(zip(values[0::3], values[1::3], values[2::3]))
+        unique = list(dict.fromkeys(points))
+        if not unique:
+            return array("i")
+        scale = self.accuracy.__rtruediv__
+        xs, ys, zs = zip(*unique)
+        cxs, cys, czs = (list(map(math.floor, map(scale, axis))) for axis in (xs, ys, zs))
+        cells = list(zip(cxs, cys, czs))
+        # mixed radix numbering with a spare cell on both ends of every axis, so neighbours don't wrap
+        min_x, min_y, min_z = min(cxs) - 1, min(cys) - 1, min(czs) - 1
+        size_y, size_z = max(cys) - min_y + 2, max(czs) - min_z + 2
+        keys = [((x - min_x) * size_y + y - min_y) * size_z + z - min_z for x, y, z in cells]
+        occupied = Counter(keys)
+        contested = {key for key, count in occupied.items() if count > 1}
+        for dx, dy, dz in FORWARD_CELLS:
+            offset = (dx * size_y + dy) * size_z + dz
+            found = occupied.keys() & set(map(offset.__add__, occupied))
+            contested.update(found)
+            contested.update(map((-offset).__add__, found))
+
+        grid = self._grid
+        node_coordinates = self.coordinates
+        node_cells = []
+        nodes = []
+        for point, cell, is_contested in zip(unique, cells, map(contested.__contains__, keys)):
+            index = self.find(*point) if is_contested else None
+            if index is None:
+                index = len(node_cells)
+                node_coordinates.extend(point)
+                node_cells.append(cell)
+                if is_contested:
+                    grid.setdefault(cell, []).append(index)
+            nodes.append(index)
+        # nodes of uncontested cells are alone in their cell
+        for index, cell in enumerate(node_cells):
+            if cell not in grid:
+                grid[cell] = [index]
+        self._exact = dict(zip(unique, nodes))
+        return array("i", map(self._exact.__getitem__, points))
+
+
+def merge_nodes(coordinates: Iterable[float], accuracy: float = Point.accuracy) -> tuple[array, array]:
+    """Batch node merging of flat (x, y, z, ...) coordinates, see `NodeMerger.add_all`.
+
+    Returns the flat coordinates of the unique nodes and, for every input vertex, the index
+    of the node it was merged into.
+    """
+    merger = NodeMerger(accuracy)
+    inverse = merger.add_all(coordinates)
+    return merger.coordinates, inverse
@@ -0,0 +1,129 @@
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+
+def node_adjacency(node_count: int, elements: Iterable[Sequence[int]]) -> list[set[int]]:
+    """Neighbours of every node, nodes sharing an element are neighbours. Numbers start at 1."""
+    adjacency = [set() for _ in range(node_count + 1)]
+    for element in elements:
+        for node in element:
+            adjacency[node].update(element)
+    for node, neighbours in enumerate(adjacency):
+        neighbours.discard(node)
+    return adjacency
+
+
+def bandwidth(elements: Iterable[Sequence[int]]) -> int:
+    """The largest node number difference within an element."""
+    return max((max(element) - min(element) for element in elements), default=0)
+
+
+def profile(node_count: int, elements: Iterable[Sequence[int]]) -> int:
+    """Sum over the nodes of the distance to their lowest numbered neighbour (matrix envelope)."""
+    lowest = list(range(node_count + 1))
+    for element in elements:
+        first = min(element)
+        for node in element:
+            if first < lowest[node]:
+                lowest[node] = first
+    return sum(node - first for node, first in enumerate(lowest))
+
+
+@dataclass
+class BandwidthReport:
+    nodes: int
+    bandwidth_before: int
+    bandwidth_after: int
+    profile_before: int
+    profile_after: int
+
+    @property
+    def improved(self) -> bool:
+        """Neither the bandwidth nor the profile got worse and at least one got better."""
+        return (
+            self.bandwidth_after <= self.bandwidth_before
+            and self.profile_after <= self.profile_before
+            and (self.bandwidth_after, self.profile_after) != (self.bandwidth_before, self.profile_before)
+        )
+
+    def __str__(self):
+        return (
+            f"{self.nodes} nodes, bandwidth {self.bandwidth_before} -> {self.bandwidth_after}, "
+            f"profile {self.profile_before} -> {self.profile_after}"
+        )
+
+
+def measure(node_count: int, before: list[Sequence[int]], after: list[Sequence[int]]) -> BandwidthReport:
+    """Compares the same elements under two node numberings."""
+    return BandwidthReport(
+        node_count, bandwidth(before), bandwidth(after), profile(node_count, before), profile(node_count, after)
+    )
+
+
+def _levels(adjacency: list[set[int]], root: int) -> list[list[int]]:
+    levels = [[root]]
+    seen = {root}
+    while True:
+        level = [n for node in levels[-1] for n in adjacency[node] if n not in seen and not seen.add(n)]
+        if not level:
+            return levels
+        levels.append(level)
+
+
+def _peripheral_node(adjacency: list[set[int]], start: int) -> int:
+    """A node far from the rest of its component, found by repeated breadth-first sweeps."""
+    root = start
+    depth = 0
+    while True:
+        levels = _levels(adjacency, root)
+        if len(levels) <= depth:
+            return root
+        depth = len(levels)
+        candidate = min(levels[-1], key=lambda node: len(adjacency[node]))
+        if candidate == root:
+            return root
+        root = candidate
+
+
+def reverse_cuthill_mckee(node_count: int, elements: Iterable[Sequence[int]]) -> array:
+    """Profile reducing node order.
+
+    Returns the new number of every node: `numbering[old - 1] == new`, numbers start at 1.
+    """
+    adjacency = node_adjacency(node_count, elements)
+    degree = [len(neighbours) for neighbours in adjacency]
+    visited = bytearray(node_count + 1)
+    order = []
+    for start in sorted(range(1, node_count + 1), key=degree.__getitem__):
+        if visited[start]:
+            continue
+        root = _peripheral_node(adjacency, start)
+        visited[root] = 1
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbour in sorted(adjacency[node], key=degree.__getitem__):
+                if not visited[neighbour]:
+                    visited[neighbour] = 1
+                    queue.append(neighbour)
+    numbering = array("i", bytes(4 * node_count))
+    for number, node in enumerate(reversed(order), start=1):
+        numbering[node - 1] = number
+    return numbering
+
+
+def choose_numbering(node_count: int, elements: Iterable[Sequence[int]]) -> array:
+    """`reverse_cuthill_mckee` numbering when it improves the elements' bandwidth or profile
+    without making the other worse, else the nodes keep their numbers.
+
+    RCM reduces the profile, on regular meshes such as frames it can still widen the bandwidth.
+    """
+    elements = list(elements)
+    numbering = reverse_cuthill_mckee(node_count, elements)
+    renumbered = [tuple(numbering[node - 1] for node in element) for element in elements]
+    if measure(node_count, elements, renumbered).improved:
+        return numbering
+    return array("i", range(1, node_count + 1))
@@ -0,0 +1,123 @@
+import math
+from itertools import product
+from typing import Iterator, Sequence
+
+# finest grid of `overlapping_boxes` along one axis
+MAX_CELLS = 256
+
+
+class GridIndex:
+    """Bucket index of points for bounding box queries.
+
+    `coordinates` are flat (x, y, z, ...), points are referred to by their position. When no
+    cell size is given it is picked so that an average cell holds about one point.
+    """
+
+    def __init__(self, coordinates: Sequence[float], cell_size: float | None = None):
+        self.coordinates = coordinates
+        count = len(coordinates) // 3
+        self.lower = [min(coordinates[axis::3], default=0.0) for axis in range(3)]
+        self.upper = [max(coordinates[axis::3], default=0.0) for axis in range(3)]
+        if cell_size is None:
+            extents = [self.upper[axis] - self.lower[axis] for axis in range(3)]
+            dimensions = sum(1 for extent in extents if extent > 0) or 1
+            cell_size = max(extents) / max(round(count ** (1 / dimensions)), 1) or 1.0
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int, int], list[int]] = {}
+        for index in range(count):
+            key = self.cell(coordinates[index * 3], coordinates[index * 3 + 1], coordinates[index * 3 + 2])
+            self._cells.setdefault(key, []).append(index)
+
+    def __len__(self):
+        return len(self.coordinates) // 3
+
+    def cell(self, x: float, y: float, z: float) -> tuple[int, int, int]:
+        return (
+            math.floor(x / self.cell_size),
+            math.floor(y / self.cell_size),
+            math.floor(z / self.cell_size),
+        )
+
+    def query_box(self, lower: Sequence[float], upper: Sequence[float]) -> list[int]:
+        """Returns the points inside the box, bounds included."""
+        # the box is clipped to the indexed points, so a huge box doesn't walk empty cells
+        lower = [max(lower[axis], self.lower[axis]) for axis in range(3)]
+        upper = [min(upper[axis], self.upper[axis]) for axis in range(3)]
+        if any(lower[axis] > upper[axis] for axis in range(3)):
+            return []
+        (x0, y0, z0), (x1, y1, z1) = self.cell(*lower), self.cell(*upper)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) > len(self._cells):
+            buckets = [
+                bucket for (cx, cy, cz), bucket in self._cells.items()
+                if x0 <= cx <= x1 and y0 <= cy <= y1 and z0 <= cz <= z1
+            ]
+        else:
+            buckets = [
+                self._cells.get((cx, cy, cz), ())
+                for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1) for cz in range(z0, z1 + 1)
+            ]
+        coordinates = self.coordinates
+        (lx, ly, lz), (ux, uy, uz) = lower, upper
+        found = []
+        for bucket in buckets:
+            for index in bucket:
+                x, y, z = coordinates[index * 3:index * 3 + 3]
+                if lx <= x <= ux and ly <= y <= uy and lz <= z <= uz:
+                    found.append(index)
+        return found
+
+    def query_points(self, points: Sequence[Sequence[float]], padding: float = 0.0) -> list[int]:
+        """Returns the points inside the bounding box of `points` grown by `padding`."""
+        lower = [min(point[axis] for point in points) - padding for axis in range(3)]
+        upper = [max(point[axis] for point in points) + padding for axis in range(3)]
+        return self.query_box(lower, upper)
+
+
+def overlapping_boxes(
+        lowers: Sequence[Sequence[float]], uppers: Sequence[Sequence[float]], padding: float = 0.0
+) -> Iterator[tuple[int, int]]:
+    """Index pairs of boxes overlapping each other once grown by `padding`.
+
+    Boxes are bucketed in every cell of a uniform grid they cover, the cell size is the median
+    grown box size, so only boxes sharing a cell are compared. Each pair is yielded once.
+    """
+    count = len(lowers)
+    if count < 2:
+        return
+    sizes = sorted(max(upper[axis] - lower[axis] for axis in range(3)) for lower, upper in zip(lowers, uppers))
+    extent = max(max(upper[axis] for upper in uppers) - min(lower[axis] for lower in lowers) for axis in range(3))
+    # the median box is sized once grown, a grid as wide as the bars of a regular frame would
+    # push the grown bars into the next cells too; a box never covers more than MAX_CELLS cells
+    # along an axis
+    cell_size = max(sizes[count // 2] + 2 * padding, extent / MAX_CELLS, padding) or 1.0
+    lowers = [[value - padding for value in lower] for lower in lowers]
+    uppers = [[value + padding for value in upper] for upper in uppers]
+    cells: dict[tuple[int, int, int], list[int]] = {}
+    firsts = []
+    for index, (lower, upper) in enumerate(zip(lowers, uppers)):
+        first = [math.floor(lower[axis] / cell_size) for axis in range(3)]
+        last = [math.floor(upper[axis] / cell_size) for axis in range(3)]
+        firsts.append(first)
+        for key in product(*(range(first[axis], last[axis] + 1) for axis in range(3))):
+            cells.setdefault(key, []).append(index)
+
+    # a pair is yielded only from the cell holding the lower corner of the overlap, the cell
+    # both boxes start in along every axis
+    for (cx, cy, cz), bucket in cells.items():
+        for position, i in enumerate(bucket):
+            lower, upper, first = lowers[i], uppers[i], firsts[i]
+            for j in bucket[position + 1:]:
+                other_first = firsts[j]
+                if (
+                        (first[0] != cx and other_first[0] != cx)
+                        or (first[1] != cy and other_first[1] != cy)
+                        or (first[2] != cz and other_first[2] != cz)
+                ):
+                    continue
+                other_lower, other_upper = lowers[j], uppers[j]
+                if (
+                        lower[0] <= other_upper[0] and other_lower[0] <= upper[0]
+                        and lower[1] <= other_upper[1] and other_lower[1] <= upper[1]
+                        and lower[2] <= other_upper[2] and other_lower[2] <= upper[2]
+                ):
+                    yield i, j
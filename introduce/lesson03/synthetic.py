@@ -0,0 +1,84 @@
+"""Parametric DXF models for benchmarks.
+
+A frame is a grid of columns and beams with a slab of 3DFACE panels on every storey, supported
+by a DOF face under its base. A shell is a flat mesh of 3DFACE panels held by a DOF line along
+one edge. Only the ENTITIES section is written, which is all `DXFParser` reads.
+"""
+from typing import Iterable, Iterator, Sequence
+
+COLUMN_LAYER = "B40 H40"
+BEAM_LAYER = "B30 H50"
+SLAB_LAYER = "H20"
+SHELL_LAYER = "H12"
+SUPPORT_LAYER = "DOF x y z"
+EDGE_SUPPORT_LAYER = "DOF z"
+
+MODELS = ("frame", "shell")
+
+
+def _record(entity_type: str, layer: str, *points: Sequence[float]) -> str:
+    tags = [f"  0\n{entity_type}\n  8\n{layer}\n"]
+    for i, (x, y, z) in enumerate(points):
+        tags.append(f" 1{i}\n{x}\n 2{i}\n{y}\n 3{i}\n{z}\n")
+    return "".join(tags)
+
+
+def line(layer: str, start: Sequence[float], end: Sequence[float]) -> str:
+    return _record("LINE", layer, start, end)
+
+
+def face(layer: str, corners: Sequence[Sequence[float]]) -> str:
+    return _record("3DFACE", layer, *corners)
+
+
+def frame_model(bays: int, storeys: int, span: float = 6.0, height: float = 3.0) -> Iterator[str]:
+    """bays x bays grid frame, (bays + 1)^2 * storeys columns, 2 * bays * (bays + 1) * storeys beams
+    and bays^2 * storeys slab panels."""
+    for storey in range(storeys):
+        z0, z1 = storey * height, (storey + 1) * height
+        for i in range(bays + 1):
+            for j in range(bays + 1):
+                x, y = i * span, j * span
+                yield line(COLUMN_LAYER, (x, y, z0), (x, y, z1))
+                if i < bays:
+                    yield line(BEAM_LAYER, (x, y, z1), (x + span, y, z1))
+                if j < bays:
+                    yield line(BEAM_LAYER, (x, y, z1), (x, y + span, z1))
+                if i < bays and j < bays:
+                    yield face(SLAB_LAYER, [
+                        (x, y, z1), (x + span, y, z1), (x + span, y + span, z1), (x, y + span, z1)
+                    ])
+    size = bays * span
+    yield face(SUPPORT_LAYER, [(0.0, 0.0, 0.0), (size, 0.0, 0.0), (size, size, 0.0), (0.0, size, 0.0)])
+
+
+def shell_model(cells: int, size: float = 1.0) -> Iterator[str]:
+    """cells x cells mesh of panels held along its y = 0 edge."""
+    for i in range(cells):
+        for j in range(cells):
+            x, y = i * size, j * size
+            yield face(SHELL_LAYER, [(x, y, 0.0), (x + size, y, 0.0), (x + size, y + size, 0.0), (x, y + size, 0.0)])
+    yield line(EDGE_SUPPORT_LAYER, (0.0, 0.0, 0.0), (cells * size, 0.0, 0.0))
+
+
+def model(kind: str, entities: int) -> Iterator[str]:
+    """A model of the given kind with about `entities` entities."""
+    if kind == "frame":
+        # 4 entities per grid point and storey, as many storeys as bays
+        bays = max(round((entities / 4) ** (1 / 3)), 1)
+        return frame_model(bays, bays)
+    if kind == "shell":
+        return shell_model(max(round(entities ** 0.5), 1))
+    raise ValueError(f"unknown model {kind!r}, expected one of {', '.join(MODELS)}")
+
+
+def write_dxf(path: str, records: Iterable[str]) -> int:
+    """Writes the records as the ENTITIES section of a DXF file, returns how many were written."""
+    count = 0
+    with open(path, "w", buffering=1 << 20, encoding="utf-8") as f:
+        f.write("  0\nSECTION\n  2\nENTITIES\n")
+        for record in records:
+            f.write(record)
+            count += 1
+        f.write("  0\nENDSEC\n  0\nEOF\n")
+    return count
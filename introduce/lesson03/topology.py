@@ -0,0 +1,138 @@
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Iterable, Sequence
+
+from introduce.lesson03.kernels import line_distance, points_on_segments, segment_crossing
+from introduce.lesson03.spatial_index import GridIndex, overlapping_boxes
+
+# LIRA element type, layer index, node numbers
+Element = tuple[int, int, tuple[int, ...]]
+
+
+def element_key(element: Element) -> tuple:
+    """Connectivity of an element regardless of node order or a repeated corner."""
+    element_type, layer, nodes = element
+    return element_type, layer, tuple(sorted(set(nodes)))
+
+
+def find_duplicates(elements: Iterable[Element]) -> list[int]:
+    """Positions of the elements whose key repeats the key of an earlier element."""
+    seen = set()
+    duplicates = []
+    for position, element in enumerate(elements):
+        key = element_key(element)
+        if key in seen:
+            duplicates.append(position)
+        else:
+            seen.add(key)
+    return duplicates
+
+
+def _node(coordinates: Sequence[float], number: int) -> Sequence[float]:
+    return coordinates[(number - 1) * 3:number * 3]
+
+
+def nodes_on_bars(nodes: GridIndex, bars: Sequence[tuple[int, int]], tolerance: float) -> dict[int, list[int]]:
+    """Maps bar position to the nodes lying on the bar other than its ends.
+
+    Node numbers start at 1, node `n` is point `n - 1` of the index.
+    """
+    coordinates = nodes.coordinates
+    found = {}
+    for position, (start, end) in enumerate(bars):
+        a, b = _node(coordinates, start), _node(coordinates, end)
+        candidates = [i + 1 for i in nodes.query_points((a, b), tolerance) if i + 1 != start and i + 1 != end]
+        if not candidates:
+            continue
+        points = list(chain.from_iterable(_node(coordinates, number) for number in candidates))
+        on_bar = [candidates[index] for index, _ in points_on_segments(points, a, b, tolerance)]
+        if on_bar:
+            found[position] = on_bar
+    return found
+
+
+def find_overlaps(nodes: GridIndex, bars: Sequence[tuple[int, int]], tolerance: float) -> list[tuple[int, int]]:
+    """Position pairs of collinear bars sharing more than a point.
+
+    Two such bars with different nodes always have an end of one inside the other, so only
+    bars meeting at the nodes found by `nodes_on_bars` are tested.
+    """
+    incident = defaultdict(list)
+    for position, (start, end) in enumerate(bars):
+        incident[start].append(position)
+        incident[end].append(position)
+    coordinates = nodes.coordinates
+    pairs = set()
+    for position, inner_nodes in nodes_on_bars(nodes, bars, tolerance).items():
+        a, b = (_node(coordinates, number) for number in bars[position])
+        for node in inner_nodes:
+            for other in incident.get(node, ()):
+                start, end = bars[other]
+                far = start if end == node else end
+                if far != node and line_distance(_node(coordinates, far), a, b) <= tolerance:
+                    pairs.add((min(position, other), max(position, other)))
+    return sorted(pairs)
+
+
+def segment_crossings(
+        coordinates: Sequence[float], bars: Sequence[tuple[int, int]], tolerance: float
+) -> list[tuple[int, int, tuple[float, float, float]]]:
+    """(bar, bar, point) of bars passing each other within `tolerance`, bars sharing a node are skipped."""
+    ends = [(_node(coordinates, start), _node(coordinates, end)) for start, end in bars]
+    lowers = [tuple(map(min, a, b)) for a, b in ends]
+    uppers = [tuple(map(max, a, b)) for a, b in ends]
+    crossings = []
+    for first, second in overlapping_boxes(lowers, uppers, tolerance):
+        (start, end), (other_start, other_end) = bars[first], bars[second]
+        if start == other_start or start == other_end or end == other_start or end == other_end:
+            continue
+        crossing = segment_crossing(*ends[first], *ends[second], tolerance)
+        if crossing is not None:
+            crossings.append((min(first, second), max(first, second), crossing[2]))
+    return crossings
+
+
+def split_points(
+        coordinates: Sequence[float], bars: Sequence[tuple[int, int]], tolerance: float
+) -> dict[int, list[tuple[float, float, float]]]:
+    """Points splitting each bar, ordered from its start: nodes lying on it and crossings with other bars.
+
+    Points within `tolerance` of a bar end or of each other are dropped.
+    """
+    candidates = defaultdict(list)
+    nodes = GridIndex(coordinates)
+    for position, inner_nodes in nodes_on_bars(nodes, bars, tolerance).items():
+        candidates[position].extend(tuple(_node(coordinates, number)) for number in inner_nodes)
+    for first, second, point in segment_crossings(coordinates, bars, tolerance):
+        candidates[first].append(point)
+        candidates[second].append(point)
+
+    splits = {}
+    for position, points in candidates.items():
+        start, end = (_node(coordinates, number) for number in bars[position])
+        length = math.dist(start, end)
+        along = sorted((math.dist(start, point), point) for point in points)
+        kept = []
+        last = 0.0
+        for distance, point in along:
+            if distance - last > tolerance and length - distance > tolerance:
+                kept.append(point)
+                last = distance
+        if kept:
+            splits[position] = kept
+    return splits
+
+
+@dataclass
+class DuplicateReport:
+    # removed elements per layer name
+    duplicates: Counter = field(default_factory=Counter)
+    # collinear overlapping bar pairs per layer name, a pair across two layers counts for both
+    overlaps: Counter = field(default_factory=Counter)
+
+    def __str__(self):
+        def counts(counter: Counter) -> str:
+            return ", ".join(f"{layer}: {count}" for layer, count in sorted(counter.items())) or "none"
+        return f"duplicates removed: {counts(self.duplicates)}; overlapping bars: {counts(self.overlaps)}"